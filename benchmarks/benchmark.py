@@ -0,0 +1,310 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Benchmark suite: times every color conversion, image I/O and the utils 
+functions over dtypes, image sizes and batch sizes, reporting throughput 
+(megapixels per second), peak memory and allocations. Results can be saved
+as JSON and compared against a saved baseline:
+
+    python benchmarks/benchmark.py --output baseline.json
+    (upgrade the library)
+    python benchmarks/benchmark.py --compare baseline.json
+
+With --compare the exit status is 1 if any case got slower, or allocates 
+more, than the tolerance allows, so it can gate an upgrade in CI
+"""
+
+# site-packages
+import numpy as np
+
+# local
+import image_processing as ipn
+import image_processing.constants as cts
+from image_processing.color_conversion import conversion_methods
+from image_processing.imageio import RAW_EXTENSION
+
+# native
+import argparse
+import collections
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+# (height, width) of the benchmarked image sizes
+SIZES = {
+    "thumb": (120, 160),
+    "vga": (480, 640),
+    "hd": (1080, 1920),
+    "4k": (2160, 3840),
+    "8k": (4320, 7680)
+}
+DTYPES = ["uint8", "float32", "float64"]
+
+# flag value -> name, i.e. 6 -> "RGB2HSV"
+COLOR_NAMES = {value: name[len("COLOR_"):] for name, value in vars(cts).items() 
+               if name.startswith("COLOR_")}
+
+# conversions that expect the output of another one as input
+SOURCE_MODES = {
+    cts.COLOR_HSV2RGB: cts.COLOR_RGB2HSV,
+    cts.COLOR_HLS2RGB: cts.COLOR_RGB2HLS,
+    cts.COLOR_XYZ2RGB: cts.COLOR_RGB2XYZ,
+    cts.COLOR_Lab2RGB: cts.COLOR_RGB2Lab,
+    cts.COLOR_YCrCb2RGB: cts.COLOR_RGB2YCrCb,
+    cts.COLOR_Luv2RGB: cts.COLOR_RGB2Luv,
+    cts.COLOR_RGBA2RGB: cts.COLOR_RGB2RGBA,
+    cts.COLOR_GRAY2RGB: cts.COLOR_RGB2GRAY
+}
+
+
+def make_image(shape: tuple, dtype: str, seed: int = 0) -> np.ndarray:
+    """Smooth random RGB image (... x H x W x 3) with values in the dtype's range
+    Smooth content keeps encoders and thresholds from hitting worst cases
+    """
+    rng = np.random.default_rng(seed)
+    height, width = shape[-3:-1]
+    coarse = rng.random(shape[:-3] + (height // 8 + 2, width // 8 + 2, 3))
+    rows = np.linspace(0, coarse.shape[-3] - 1.001, height).astype(int)
+    cols = np.linspace(0, coarse.shape[-2] - 1.001, width).astype(int)
+    image = coarse[..., rows, :, :][..., cols, :]
+    image = 0.9 * image + 0.1 * rng.random(image.shape)
+    return np.ascontiguousarray(ipn.convert_dtype(image, dtype))
+
+# blocks allocated by the snapshots themselves, and the smallest block 
+# counted as an allocation
+_OWN_TRACES = [tracemalloc.Filter(False, tracemalloc.__file__)]
+_MIN_BLOCK = 1024
+
+def measure(func, min_repeat: int, min_time: float) -> dict:
+    """Times func (after one warm-up call) and measures its peak memory
+    (what Python and NumPy allocate, traced with tracemalloc) and its 
+    allocations: blocks of at least _MIN_BLOCK bytes it allocated that are
+    still alive when it returns (result arrays and anything cached or 
+    leaked; smaller blocks come and go with interpreter internals)
+    """
+    func()
+    times = []
+    start = time.perf_counter()
+    while len(times) < min_repeat or time.perf_counter() - start < min_time:
+        tic = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - tic)
+    
+    # tracing slows everything down, so memory gets its own run
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    after = tracemalloc.take_snapshot().filter_traces(_OWN_TRACES)
+    del result
+    tracemalloc.stop()
+    blocks = [collections.Counter((trace.traceback, trace.size) for trace in snapshot.traces 
+                                  if trace.size >= _MIN_BLOCK) for snapshot in (before, after)]
+    allocations = sum((blocks[1] - blocks[0]).values())
+    return {"median_s": statistics.median(times), "min_s": min(times), 
+            "runs": len(times), "peak_bytes": peak, "allocations": allocations}
+
+def load(path: str) -> np.ndarray:
+    """read_image, forcing raw (memory-mapped) files to actually be read
+    """
+    image = ipn.read_image(path, cts.READ_COLOR)
+    return np.array(image) if isinstance(image, np.memmap) else image
+
+def conversion_cases(dtypes: list, sizes: list, batches: list, max_pixels: int):
+    """Yields (group, name, dtype, size, batch, pixels, func) for every conversion mode
+    """
+    for dtype in dtypes:
+        for size in sizes:
+            for batch in batches:
+                shape = ((batch,) if batch > 1 else ()) + SIZES[size] + (3,)
+                pixels = int(np.prod(shape[:-1]))
+                if pixels > max_pixels:
+                    continue
+                rgb = make_image(shape, dtype)
+                for mode in conversion_methods:
+                    source = rgb
+                    if mode in SOURCE_MODES:
+                        source = ipn.convert_color(rgb, SOURCE_MODES[mode])
+                    func = lambda source=source, mode=mode: ipn.convert_color(source, mode)
+                    yield "convert_color", COLOR_NAMES[mode], dtype, size, batch, pixels, func
+
+def utils_cases(dtypes: list, sizes: list, batches: list, max_pixels: int):
+    """Yields benchmark cases for utils and the image operations
+    """
+    for dtype in dtypes:
+        for size in sizes:
+            for batch in batches:
+                shape = ((batch,) if batch > 1 else ()) + SIZES[size] + (3,)
+                pixels = int(np.prod(shape[:-1]))
+                if pixels > max_pixels:
+                    continue
+                image = make_image(shape, dtype)
+                gray = ipn.convert_color(image, cts.COLOR_RGB2GRAY)
+                channels = ipn.split(image)
+                other = "float32" if dtype == "uint8" else "uint8"
+                high = 1.0 if dtype != "uint8" else 255
+                cases = {
+                    "normalize": lambda: ipn.normalize(image),
+                    "map_to_range": lambda: ipn.map_to_range(image, -1, 1),
+                    "clip_to_range": lambda: ipn.clip_to_range(image, high * 0.1, high * 0.9),
+                    "minmax_per_channel": lambda: ipn.minmax(image, per_channel=True),
+                    "convert_dtype": lambda: ipn.convert_dtype(image, other),
+                    "split": lambda: ipn.split(image),
+                    "merge": lambda: ipn.merge(channels, copy=True),
+                    "to_planar": lambda: ipn.to_planar(image),
+                    "threshold_otsu": lambda: ipn.threshold(gray, mode=cts.THRESH_OTSU, 
+                                                            per_item=batch > 1),
+                    "erode_square_15": lambda: ipn.erode(gray, 15)
+                }
+                if dtype == "float64":
+                    del cases["threshold_otsu"]
+                for name, func in cases.items():
+                    yield "utils", name, dtype, size, batch, pixels, func
+
+def io_cases(dtypes: list, sizes: list, directory: str, max_pixels: int):
+    """Yields read_image/write_image cases (PNG for uint8, raw for every dtype)
+    """
+    for dtype in dtypes:
+        for size in sizes:
+            pixels = int(np.prod(SIZES[size]))
+            if pixels > max_pixels:
+                continue
+            image = make_image(SIZES[size] + (3,), dtype)
+            formats = [".png", RAW_EXTENSION] if dtype == "uint8" else [RAW_EXTENSION]
+            for extension in formats:
+                path = os.path.join(directory, f"{size}_{dtype}{extension}")
+                write = lambda image=image, path=path: ipn.write_image(
+                    image, path, overwrite=cts.OVERWRITE_ALLOW)
+                write()
+                read = lambda path=path: load(path)
+                name = extension.lstrip(".")
+                yield "imageio", f"write_image_{name}", dtype, size, 1, pixels, write
+                yield "imageio", f"read_image_{name}", dtype, size, 1, pixels, read
+
+def run(args) -> list:
+    """Runs every selected case, printing one line per case
+    """
+    dtypes, sizes = args.dtypes.split(","), args.sizes.split(",")
+    batches = [int(batch) for batch in args.batches.split(",")]
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        groups = {
+            "convert_color": conversion_cases(dtypes, sizes, batches, args.max_pixels),
+            "utils": utils_cases(dtypes, sizes, batches, args.max_pixels),
+            "imageio": io_cases(dtypes, sizes, directory, args.max_pixels)
+        }
+        for group in args.groups.split(","):
+            for _, name, dtype, size, batch, pixels, func in groups[group]:
+                if args.filter and args.filter not in f"{group}.{name}":
+                    continue
+                stats = measure(func, args.repeat, args.min_time)
+                megapixels = pixels / 1e6
+                result = {"group": group, "name": name, "dtype": dtype, "size": size, 
+                          "batch": batch, "megapixels": megapixels, 
+                          "mp_per_s": megapixels / stats["median_s"], **stats}
+                results.append(result)
+                print(f"{group:>13} {name:<20} {dtype:<8} {size:<6} x{batch:<3} "
+                      f"{result['mp_per_s']:10.1f} MP/s {stats['median_s'] * 1e3:10.2f} ms "
+                      f"{stats['peak_bytes'] / 2**20:10.1f} MB {stats['allocations']:6d} allocs", 
+                      flush=True)
+    return results
+
+def key(result: dict) -> tuple:
+    """Identifies a case across runs
+    """
+    return (result["group"], result["name"], result["dtype"], result["size"], result["batch"])
+
+def compare(results: list, baseline: dict, tolerance: float) -> int:
+    """Prints throughput and allocation changes against a baseline and 
+    counts regressions (slower, or more allocations, beyond the tolerance)
+    """
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = 0
+    print(f"\n{'case':<58} {'baseline':>10} {'current':>10} {'change':>8} "
+          f"{'allocs':>13}")
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        change = result["mp_per_s"] / old["mp_per_s"] - 1
+        # baselines saved before allocations were recorded have none
+        old_allocations = old.get("allocations", result["allocations"])
+        flag = ""
+        if change < -tolerance:
+            flag += "  REGRESSION"
+        if result["allocations"] > old_allocations * (1 + tolerance):
+            flag += "  MORE ALLOCATIONS"
+        regressions += bool(flag)
+        name = " ".join(str(part) for part in key(result))
+        allocations = f"{old_allocations} -> {result['allocations']}"
+        print(f"{name:<58} {old['mp_per_s']:10.1f} {result['mp_per_s']:10.1f} "
+              f"{change:+8.1%} {allocations:>13}{flag}")
+    print(f"\n{regressions} regression(s) beyond {tolerance:.0%}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="image_processing benchmark suite")
+    parser.add_argument("--groups", default="convert_color,utils,imageio",
+                        help="comma separated groups: convert_color, utils, imageio")
+    parser.add_argument("--dtypes", default=",".join(DTYPES))
+    parser.add_argument("--sizes", default=",".join(SIZES), 
+                        help=f"comma separated subset of {', '.join(SIZES)}")
+    parser.add_argument("--batches", default="1,8", help="comma separated batch sizes")
+    parser.add_argument("--max-pixels", type=int, default=int(34e6),
+                        help="skip cases with more pixels than this (image x batch)")
+    parser.add_argument("--filter", default=None, help="only cases whose group.name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="minimum timed runs per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum timed seconds per case")
+    parser.add_argument("--output", default=None, help="save results as JSON")
+    parser.add_argument("--compare", default=None, help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="slowdown (fraction of baseline throughput) counted as a regression")
+    args = parser.parse_args()
+    
+    results = run(args)
+    if args.output is not None:
+        meta = {"date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0], "numpy": np.__version__,
+                "platform": platform.platform(), "processor": platform.processor(),
+                "cpus": os.cpu_count(), "arguments": vars(args)}
+        with open(args.output, "w") as file:
+            json.dump({"meta": meta, "results": results}, file, indent=1)
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        return 1 if compare(results, baseline, args.tolerance) else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
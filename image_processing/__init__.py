@@ -25,4 +25,10 @@ SOFTWARE.
 from image_processing.utils import *
 from image_processing.constants import  *
 from image_processing.color_conversion import *
-from image_processing.imageio import *
\ No newline at end of file
+from image_processing.imageio import *
+from image_processing.lut import *
+from image_processing.pipeline import *
+from image_processing.batch import *
+from image_processing.thresholding import *
+from image_processing.morphology import *
+from image_processing.instrumentation import *
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# site-packages
+import numpy as np
+
+# local
+import image_processing.constants as cts
+from image_processing.imageio import write_image
+
+# native
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+# state of a BatchRunner worker process (set once by _init_worker)
+_worker = {}
+
+
+class _SharedFrame:
+    """Placeholder sent instead of an array that was copied into a slot
+    """
+    def __init__(self, shape: tuple, dtype: str):
+        self.shape = shape
+        self.dtype = dtype
+
+def _as_stage(stage) -> tuple:
+    """Turns a callable or a (callable, *args[, kwargs]) tuple into
+    (callable, args, kwargs)
+    """
+    if callable(stage):
+        return (stage, (), {})
+    if isinstance(stage, tuple) and stage and callable(stage[0]):
+        args = stage[1:]
+        if args and isinstance(args[-1], dict):
+            return (stage[0], args[:-1], args[-1])
+        return (stage[0], args, {})
+    raise TypeError(f"Stage {stage!r} is not a callable or a (callable, *args) tuple.")
+
+def _slot_views(block, frame_nbytes: int) -> tuple:
+    """Input and output halves of a slot
+    """
+    buffer = np.ndarray((2 * frame_nbytes,), dtype="uint8", buffer=block.buf)
+    return buffer[:frame_nbytes], buffer[frame_nbytes:]
+
+def _to_slot(value, half: np.ndarray):
+    """Copies an array into a slot half, or returns it as is if it can't go there
+    """
+    if not isinstance(value, np.ndarray) or value.dtype.hasobject or value.nbytes > half.nbytes:
+        return value
+    view = half[:value.nbytes].view(value.dtype).reshape(value.shape)
+    np.copyto(view, value)
+    return _SharedFrame(value.shape, value.dtype.str)
+
+def _from_slot(value, half: np.ndarray):
+    """Inverse of _to_slot (the array is a view of the slot)
+    """
+    if not isinstance(value, _SharedFrame):
+        return value
+    nbytes = int(np.prod(value.shape)) * np.dtype(value.dtype).itemsize
+    return half[:nbytes].view(value.dtype).reshape(value.shape)
+
+def _init_worker(names: list, frame_nbytes: int, stages: list, overwrite: int) -> None:
+    """Attaches a worker process to every slot, once
+    """
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    _worker["blocks"] = blocks
+    _worker["views"] = [_slot_views(block, frame_nbytes) for block in blocks]
+    _worker["stages"] = stages
+    _worker["overwrite"] = overwrite
+
+def _run_item(slot: int, item, path: str):
+    """Runs the stages on one item inside a worker
+    """
+    source, result = _worker["views"][slot]
+    value = _from_slot(item, source)
+    for func, args, kwargs in _worker["stages"]:
+        value = func(value, *args, **kwargs)
+    if path is not None:
+        return write_image(value, path, _worker["overwrite"])
+    return _to_slot(value, result)
+
+class BatchRunner:
+    """Runs a chain of stages over many frames on a process pool
+    Frames (and results) are passed through a fixed set of shared memory
+    slots instead of being pickled, and each worker attaches to the slots
+    once. At most max_pending items are in flight: map() only submits a new
+    one when a slot is free, waiting for the oldest result otherwise.
+    Arrays larger than frame_nbytes, and any other item (i.e. a path read by
+    a read_image stage), are pickled as usual
+
+    Stages are callables or (callable, *args[, kwargs]) tuples called as
+    callable(value, *args, **kwargs), so the library functions can be used
+    directly, i.e. [(read_image, READ_COLOR), (convert_color, COLOR_RGB2HSV)].
+    They must be picklable (module level functions)
+
+    Args:
+        stages (iterable): Stages applied to each item in order
+        workers (int, optional): Number of worker processes. Defaults to 4.
+        max_pending (int, optional): Number of slots (items in flight). 
+            Defaults to 2 * workers.
+        frame_nbytes (int, optional): Largest input or result passed through
+            a slot, in bytes. Defaults to 32MB.
+        overwrite (int, optional): Policy for existing files when results are
+            written (OVERWRITE_ prefix). Defaults to OVERWRITE_ALLOW.
+    """
+    def __init__(self, stages, workers: int = 4, max_pending: int = None, 
+                 frame_nbytes: int = 32 * 2**20, overwrite: int = cts.OVERWRITE_ALLOW):
+        self.stages = [_as_stage(stage) for stage in stages]
+        slots = max(2 * workers if max_pending is None else max_pending, 1)
+        self.frame_nbytes = frame_nbytes
+        self.blocks = [shared_memory.SharedMemory(create=True, size=2 * frame_nbytes)
+                       for _ in range(slots)]
+        self.views = [_slot_views(block, frame_nbytes) for block in self.blocks]
+        self.free = list(range(slots))
+        names = [block.name for block in self.blocks]
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                            initargs=(names, frame_nbytes, self.stages, overwrite))
+    
+    def map(self, items, paths=None, copy: bool = True):
+        """Runs the stages over every item, yielding the results in order
+
+        Args:
+            items (iterable): Arrays (or anything the first stage takes)
+            paths (iterable, optional): Output paths; if given each result is
+                written there by the worker and map yields write_image's
+                return value instead. Defaults to None.
+            copy (bool, optional): Yield copies of the results. If False they
+                are views of a slot, valid until the next one is requested. 
+                Defaults to True.
+
+        Yields:
+            Results of the last stage
+        """
+        paths = itertools.repeat(None) if paths is None else iter(paths)
+        pending = deque()
+        try:
+            for item in items:
+                if not self.free:
+                    yield from self._collect(pending.popleft(), copy)
+                slot = self.free.pop()
+                try:
+                    task = _to_slot(item, self.views[slot][0])
+                    future = self.executor.submit(_run_item, slot, task, next(paths))
+                except BaseException:
+                    self.free.append(slot)
+                    raise
+                pending.append((slot, future))
+            while pending:
+                yield from self._collect(pending.popleft(), copy)
+        finally:
+            # leaving early (error or unfinished loop): wait for the slots in use
+            for slot, future in pending:
+                future.exception()
+                self.free.append(slot)
+    
+    def _collect(self, entry: tuple, copy: bool):
+        """Yields the result of a submitted item, freeing its slot afterwards
+        """
+        slot, future = entry
+        try:
+            result = _from_slot(future.result(), self.views[slot][1])
+            if copy and isinstance(result, np.ndarray):
+                result = result.copy()
+            yield result
+        finally:
+            self.free.append(slot)
+    
+    def run(self, items, paths=None) -> int:
+        """Runs the stages over every item, discarding the results
+
+        Args:
+            items (iterable): Arrays (or anything the first stage takes)
+            paths (iterable, optional): Output paths (see map). Defaults to None.
+
+        Returns:
+            int: Number of items processed
+        """
+        return sum(1 for _ in self.map(items, paths, copy=False))
+    
+    def close(self) -> None:
+        """Stops the workers and releases the shared memory
+        """
+        self.executor.shutdown(wait=True)
+        self.views = []
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+__all__ = [
+    "BatchRunner"
+]
@@ -27,96 +27,434 @@ import numpy as np
 import image_processing.constants as cts
 
 # local
-from image_processing.utils import merge, split, clip_to_range
+import image_processing.lut as lut
+from image_processing.instrumentation import instrumented, describe_conversion
+from image_processing.utils import split, process_tiled, process_parallel, working_dtype, get_precision
+from image_processing.utils import get_num_threads
 
+# native
+import functools
+
+
+def _output(shape: tuple, dtype, out: np.ndarray = None) -> np.ndarray:
+    """Returns the buffer a conversion should write its result to
+
+    Args:
+        shape (tuple): Shape of the result
+        dtype: Data type of the result
+        out (np.ndarray, optional): Caller supplied buffer. Defaults to None.
+
+    Raises:
+        ValueError: If out does not have the expected shape
+        TypeError: If the result can't be cast to out's dtype (integer 
+            results need a buffer holding all their values)
+
+    Returns:
+        np.ndarray: out, or a newly allocated array if out is None
+    """
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != tuple(shape):
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {tuple(shape)}.")
+    # integer results must fit the buffer, float ones may lose precision
+    casting = "safe" if np.issubdtype(dtype, np.integer) else "same_kind"
+    if not np.can_cast(dtype, out.dtype, casting=casting):
+        raise TypeError(f"Can't write {np.dtype(dtype)} result to a {out.dtype} output buffer.")
+    return out
+
+def _merge_into(channels: list, dtype, out: np.ndarray = None) -> np.ndarray:
+    """Merge channels straight into the output buffer (casting on assignment)
+
+    Args:
+        channels (list): List of channels (all with the same shape)
+        dtype: Data type of the result
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Composed image
+    """
+    result = _output(channels[0].shape + (len(channels),), dtype, out)
+    for i, channel in enumerate(channels):
+        result[..., i] = channel
+    return result
+
+def _cast_into(result: np.ndarray, dtype, out: np.ndarray = None) -> np.ndarray:
+    """Cast a working array to the result dtype, writing to out if given
+
+    Args:
+        result (np.ndarray): Working array
+        dtype: Data type of the result
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Converted result
+    """
+    if out is None:
+        return result.astype(dtype, copy=False)
+    _output(result.shape, dtype, out)[...] = result
+    return out
+
+def _copy_into(image: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Returns image itself if out is None, else copies it into out
+
+    Args:
+        image (np.ndarray): Result (possibly a view of the input)
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Image or out
+    """
+    if out is None:
+        return image
+    np.copyto(_output(image.shape, image.dtype, out), image)
+    return out
+
+# Linear color spaces as (matrix, offset, clip), defined on values in [0, 1].
+# A single row matrix (vector) produces an image with no channel axis. Results
+# are clipped to [0, 1] if clip is set (and always for integer images)
+linear_transforms = {
+    cts.COLOR_RGB2GRAY: (
+        np.array([0.2989, 0.587, 0.114]),
+        0.0, False
+    ),
+    cts.COLOR_RGB2XYZ: (
+        np.array([[0.412453, 0.357580, 0.180423],
+                  [0.212671, 0.715160, 0.072169],
+                  [0.019334, 0.119193, 0.950227]]),
+        0.0, False
+    ),
+    cts.COLOR_XYZ2RGB: (
+        np.array([[3.240479, -1.53715, -0.498535],
+                  [-0.969256, 1.875991, 0.041556],
+                  [0.055648, -0.204043, 1.057311]]),
+        0.0, True
+    ),
+    # Y = 0.299R + 0.587G + 0.114B, Cr = 0.713(R - Y) + 0.5, Cb = 0.564(B - Y) + 0.5
+    cts.COLOR_RGB2YCrCb: (
+        np.array([[0.299, 0.587, 0.114],
+                  [0.499813, -0.418531, -0.081282],
+                  [-0.168636, -0.331068, 0.499704]]),
+        np.array([0.0, 0.5, 0.5]), True
+    ),
+    # R = Y + 1.403(Cr - 0.5), G = Y - 0.714(Cr - 0.5) - 0.344(Cb - 0.5), B = Y + 1.773(Cb - 0.5)
+    cts.COLOR_YCrCb2RGB: (
+        np.array([[1.0, 1.403, 0.0],
+                  [1.0, -0.714, -0.344],
+                  [1.0, 0.0, 1.773]]),
+        np.array([-0.7015, 0.529, -0.8865]), True
+    )
+}
+
+def _apply_linear(image: np.ndarray, transform: tuple, out: np.ndarray = None, 
+                  precision: int = None) -> np.ndarray:
+    """Applies a linear_transforms entry in a single matrix product over the
+    channel axis, followed by in-place offset, clipping and rounding
+
+    Args:
+        image (np.ndarray): Input image (... x 3, or more channels)
+        transform (tuple): (matrix, offset, clip)
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+        precision (int, optional): Working precision. Defaults to None.
+
+    Returns:
+        np.ndarray: Converted Image
+    """
+    matrix, offset, clip = transform
+    # extra channels (i.e. alpha) are ignored, as when indexing R, G and B
+    image = image[..., :3]
+    integer = np.issubdtype(image.dtype, np.integer)
+    precision = get_precision() if precision is None else precision
+    if image.dtype == np.uint8 and precision == cts.PRECISION_FIXED:
+        return _apply_linear_fixed(image, transform, out)
+    dtype = working_dtype(image.dtype, precision)
+    
+    result = np.matmul(image.astype(dtype, copy=False), matrix.T.astype(dtype))
+    if np.any(offset):
+        result += (offset * 255 if integer else offset).astype(dtype)
+    
+    if integer:
+        np.clip(result, 0, 255, out=result)
+        np.rint(result, out=result)
+        return _cast_into(result, image.dtype, out)
+    if clip:
+        np.clip(result, 0, 1, out=result)
+    return _cast_into(result, image.dtype, out)
+
+# fractional bits of the fixed-point weights
+_FIXED_SHIFT = 14
+
+def _apply_linear_fixed(image: np.ndarray, transform: tuple, out: np.ndarray = None) -> np.ndarray:
+    """Integer version of _apply_linear for uint8 images (PRECISION_FIXED)
+    Weights and offsets are quantized to _FIXED_SHIFT fractional bits and
+    every output channel is computed exactly as
+        clip((sum(round(w * 2^14) * c) + round(offset * 255 * 2^14) + 2^13) >> 14, 0, 255)
+    accumulating in int32. Results are bit-exact with this reference and
+    within 1 of the float path
+
+    Args:
+        image (np.ndarray): Input image (... x 3, uint8)
+        transform (tuple): (matrix, offset, clip)
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Converted Image
+    """
+    matrix, offset, _ = transform
+    weights = np.rint(np.atleast_2d(matrix) * (1 << _FIXED_SHIFT)).astype("int32")
+    offsets = np.rint(np.broadcast_to(offset, (len(weights),)) * 255 * (1 << _FIXED_SHIFT))
+    offsets = offsets.astype("int32") + (1 << (_FIXED_SHIFT - 1))
+    
+    channels = () if matrix.ndim == 1 else (len(weights),)
+    result = _output(image.shape[:-1] + channels, "uint8", out)
+    if np.shares_memory(result, image):
+        result = np.empty(result.shape, dtype="uint8")
+    for i, row in enumerate(weights):
+        acc = np.multiply(image[..., 0], row[0], dtype="int32")
+        acc += np.multiply(image[..., 1], row[1], dtype="int32")
+        acc += np.multiply(image[..., 2], row[2], dtype="int32")
+        acc += offsets[i]
+        acc >>= _FIXED_SHIFT
+        np.clip(acc, 0, 255, out=acc)
+        if channels:
+            result[..., i] = acc
+        else:
+            result[...] = acc
+    
+    if out is not None and result is not out:
+        out[...] = result
+        return out
+    return result
+
+# D65 reference white and constants shared by Lab and Luv (CIE 1976)
+_WHITE = np.array([0.950456, 1.0, 1.088754])
+_UV_WHITE = 4 * _WHITE[0] / np.dot(_WHITE, [1, 15, 3]), 9 * _WHITE[1] / np.dot(_WHITE, [1, 15, 3])
+_EPSILON = 0.008856
+_KAPPA = 903.3
+
+# number of pixels processed at once by the nonlinear conversions
+_BLOCK_PIXELS = 1 << 16
+
+def _srgb_to_linear(values: np.ndarray) -> np.ndarray:
+    """Removes the sRGB gamma from values in [0, 1]
+
+    Args:
+        values (np.ndarray): Gamma encoded values
+
+    Returns:
+        np.ndarray: Linear values
+    """
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+def _linear_to_srgb(values: np.ndarray) -> np.ndarray:
+    """Applies the sRGB gamma to values in [0, 1]
+
+    Args:
+        values (np.ndarray): Linear values
+
+    Returns:
+        np.ndarray: Gamma encoded values
+    """
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * values ** (1 / 2.4) - 0.055)
+
+_SRGB_LINEAR_LUT = _srgb_to_linear(np.arange(256) / 255)
+
+def _blockwise(image: np.ndarray, func, channels: int, dtype, out: np.ndarray = None) -> np.ndarray:
+    """Runs a per-pixel conversion over blocks of _BLOCK_PIXELS pixels, so
+    float temporaries are block sized and only the output is full size.
+    Integer results are rounded and clipped to [0, 255]
+
+    Args:
+        image (np.ndarray): Input image (... x C)
+        func (callable): Maps an (n x C) block to an (n x channels) float array
+        channels (int): Number of output channels
+        dtype: Data type of the result
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+
+    Returns:
+        np.ndarray: Converted Image
+    """
+    shape = image.shape[:-1] + (channels,)
+    result = _output(shape, dtype, out)
+    target = result
+    if not result.flags.c_contiguous or np.shares_memory(result, image):
+        target = np.empty(shape, dtype=result.dtype)
     
-def impl_invert_order(image: np.ndarray) -> np.ndarray:
+    pixels = image.reshape(-1, image.shape[-1])
+    flat = target.reshape(-1, channels)
+    integer = np.issubdtype(flat.dtype, np.integer)
+    for start in range(0, len(pixels), _BLOCK_PIXELS):
+        block = func(pixels[start:start + _BLOCK_PIXELS])
+        if integer:
+            np.rint(block, out=block)
+            np.clip(block, 0, 255, out=block)
+        flat[start:start + _BLOCK_PIXELS] = block
+    
+    if target is not result:
+        result[...] = target
+    return result
+
+def _rgb_block_to_xyz(block: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """Gamma encoded RGB block to XYZ (uint8 blocks go through a table)
+    """
+    if block.dtype == np.uint8:
+        linear = _SRGB_LINEAR_LUT.astype(dtype)[block]
+    else:
+        linear = _srgb_to_linear(block.astype(dtype, copy=False))
+    return linear @ linear_transforms[cts.COLOR_RGB2XYZ][0].T.astype(dtype)
+
+def _xyz_block_to_rgb(xyz: np.ndarray) -> np.ndarray:
+    """XYZ block to gamma encoded RGB in [0, 1]
+    """
+    linear = xyz @ linear_transforms[cts.COLOR_XYZ2RGB][0].T.astype(xyz.dtype)
+    np.clip(linear, 0, 1, out=linear)
+    return _linear_to_srgb(linear)
+
+def _lightness(Y: np.ndarray) -> np.ndarray:
+    """CIE lightness (L*) of relative luminance Y
+    """
+    return np.where(Y > _EPSILON, 116 * np.cbrt(Y) - 16, _KAPPA * Y)
+
+def _hue_to_rgb(H: np.ndarray, C: np.ndarray, M: np.ndarray, dtype, out: np.ndarray = None) -> np.ndarray:
+    """Shared last step of HSV2RGB and HLS2RGB. Each channel is computed as
+    M + C * (1 - clip(min(k, 4 - k), 0, 1)), k = (n + H / 60) % 6 with 
+    n = 5, 3, 1 for R, G, B, which replaces per-sector masks. Integer 
+    results are scaled to [0, 255]
+
+    Args:
+        H (np.ndarray): Hue in [0, 360]
+        C (np.ndarray): Chroma
+        M (np.ndarray): Value of the smallest channel
+        dtype: Data type of the result
+        out (np.ndarray, optional): Output buffer (may overlap H). Defaults to None.
+
+    Returns:
+        np.ndarray: RGB image
+    """
+    result = _output(H.shape + (3,), dtype, out)
+    integer = np.issubdtype(result.dtype, np.integer)
+    sector = H / 60
+    for i, n in enumerate((5, 3, 1)):
+        k = np.add(sector, n)
+        np.remainder(k, 6, out=k)
+        np.minimum(k, 4 - k, out=k)
+        np.clip(k, 0, 1, out=k)
+        np.subtract(1, k, out=k)
+        k *= C
+        k += M
+        if integer:
+            k *= 255
+        result[..., i] = k
+    return result
+    
+def impl_invert_order(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2BGR/BGR2RGB
     Invert channel order (rgb to bgr-like transformations)
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
-        np.ndarray: Converted Image
+        np.ndarray: Converted Image (a view of image if out is None)
     """
-    return image[..., ::-1]
+    return _copy_into(image[..., ::-1], out)
 
-def impl_rgb2gray(image: np.ndarray) -> np.array:
+def impl_rgb2gray(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.array:
     """RGB2GRAY
     Converts RGB to grayscale (Y channel)
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.array: Converted Image
     """
-    result = np.ceil(0.2989 * image[..., 0] + 0.587 * image[..., 1] + 0.114 * image[..., 2])
-    return result.astype(image.dtype)
+    return _apply_linear(image, linear_transforms[cts.COLOR_RGB2GRAY], out, precision)
 
-def impl_gray2rgb(image: np.ndarray) -> np.ndarray:
+def impl_gray2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """GRAY2RGB
     Repeat grayscale image along three channels
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return merge([image.copy(), image.copy(), image.copy()])
+    result = _output(image.shape + (3,), image.dtype, out)
+    result[...] = image[..., np.newaxis]
+    return result
 
-def impl_rgb2rgba(image: np.ndarray) -> np.ndarray:
+def impl_rgb2rgba(image: np.ndarray, out: np.ndarray = None, precision: int = None, 
+                  alpha=None) -> np.ndarray:
     """RGB2RGBA
-    Creates the alpha channel filling it with 255
+    Creates the alpha channel, filling it with the given alpha or with
+    the opaque value of the dtype (maximum for integers, 1 for floats)
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
+        alpha (optional): Scalar or alpha plane broadcastable to image.shape[:-1]. Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    result = np.zeros((image.shape[0], image.shape[1], 4), dtype=image.dtype)
-    for i in range(image.shape[0]):
-        for j in range(image.shape[1]):
-            result[i][j] = np.append(image[i][j], 255)
+    if alpha is None:
+        if np.issubdtype(image.dtype, np.integer):
+            alpha = np.iinfo(image.dtype).max
+        else:
+            alpha = 1
+    result = _output(image.shape[:-1] + (4,), image.dtype, out)
+    result[..., :3] = image
+    result[..., 3] = alpha
     return result
 
-def impl_rgba2rgb(image: np.ndarray) -> np.ndarray:
+def impl_rgba2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGBA2RGB
     Drops the alpha channel
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
-        np.ndarray: Converted Image
+        np.ndarray: Converted Image (a view of image if out is None)
     """
-    return image[..., :3]
+    return _copy_into(image[..., :3], out)
 
-def impl_rgb2hsv(image: np.ndarray) -> np.ndarray:
+def impl_rgb2hsv(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2HSV
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    if image.dtype != float:
-        image_float = image.astype("float64") / 255
+    is_float = np.issubdtype(image.dtype, np.floating)
+    dtype = working_dtype(image.dtype, precision)
+    if not is_float:
+        image_float = np.divide(image, 255, dtype=dtype)
     else:
-        image_float = image.copy()
+        image_float = image.astype(dtype, copy=False)
 
     R, G, B = split(image_float)
-    M = image_float.max(axis=2)
-    m = image_float.min(axis=2)
+    M = image_float.max(axis=-1)
+    m = image_float.min(axis=-1)
     
-    V = M.copy()
-    S = np.zeros_like(V)
+    V = M
     delta = M - m
-    S[M != 0] = delta[M != 0] / M[M != 0]
+    S = np.zeros_like(V)
+    np.divide(delta, M, out=S, where=M != 0)
     
     wr = np.where(np.bitwise_and(M == R, delta != 0))
     wg = np.where(np.bitwise_and(M == G, delta != 0))
@@ -129,83 +467,69 @@ def impl_rgb2hsv(image: np.ndarray) -> np.ndarray:
     H[all_eq] = 0
     H[H < 0] += 360 
     
-    if image.dtype != float:
-        return np.uint8(merge([H / 2, S * 255, V * 255]))
+    if not is_float:
+        H /= 2
+        S *= 255
+        V *= 255
+        return _merge_into([H, S, V], "uint8", out)
     else:
-        return merge([H, S, V])
+        return _merge_into([H, S, V], image.dtype, out)
 
-def impl_hsv2rgb(image: np.ndarray) -> np.ndarray:
+def impl_hsv2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """HSV2RGB
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    if image.dtype != float:
-        image_float = image.astype("float64")
+    is_float = np.issubdtype(image.dtype, np.floating)
+    dtype = working_dtype(image.dtype, precision)
+    if not is_float:
+        image_float = image.astype(dtype)
         image_float[..., 0] *= 2
-        image_float[..., 1:] = image_float[..., 1:] / 255
+        image_float[..., 1:] /= 255
     else:
-        image_float = image.copy()
+        image_float = image.astype(dtype, copy=False)
     
     H, S, V = split(image_float)
     
-    result = np.zeros(image.shape, dtype="float64")
     C = S * V
-    X = C * (1 - np.abs(((H / 60) % 2) - 1))
     M = V - C
     
-    mask = H < 60
-    result[mask] = np.dstack([C[mask], X[mask], np.zeros_like(C[mask])])
-    
-    mask = np.bitwise_and(H >= 60, H < 120)
-    result[mask] = np.dstack([X[mask], C[mask], np.zeros_like(C[mask])])
-    
-    mask = np.bitwise_and(H >= 120, H < 180)
-    result[mask] = np.dstack([np.zeros_like(C[mask]), C[mask], X[mask]])
-    
-    mask = np.bitwise_and(H >= 180, H < 240)
-    result[mask] = np.dstack([np.zeros_like(C[mask]), X[mask], C[mask]])
+    return _hue_to_rgb(H, C, M, image.dtype if is_float else "uint8", out)
     
-    mask = np.bitwise_and(H >= 240, H < 300)
-    result[mask] = np.dstack([X[mask], np.zeros_like(C[mask]), C[mask]])
-    
-    mask = H >= 300
-    result[mask] = np.dstack([C[mask], np.zeros_like(C[mask]), X[mask]])
-    
-    result += merge([M] * 3)   
-
-    if image.dtype != float:
-        return np.uint8(result * 255)
-    else:
-        return result
-    
-def impl_rgb2hls(image: np.ndarray) -> np.ndarray:
+def impl_rgb2hls(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2HLS
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    if image.dtype != float:
-        image_float = image.astype("float64") / 255
+    is_float = np.issubdtype(image.dtype, np.floating)
+    dtype = working_dtype(image.dtype, precision)
+    if not is_float:
+        image_float = np.divide(image, 255, dtype=dtype)
     else:
-        image_float = image.copy()
+        image_float = image.astype(dtype, copy=False)
 
     R, G, B = split(image_float)
-    M = image_float.max(axis=2)
-    m = image_float.min(axis=2)
+    M = image_float.max(axis=-1)
+    m = image_float.min(axis=-1)
     
     L = (M + m) / 2
     S = np.zeros_like(L)
     delta = M - m
     mask = np.bitwise_and(L < 0.5, L != 0)
     S[mask] = delta[mask] / (2 * L)[mask]
-    mask = (L >= 0.5)
+    mask = np.bitwise_and(L >= 0.5, L != 1)
     S[mask] = delta[mask] / (2 * (1 - L))[mask]
         
     wr = np.where(np.bitwise_and(M == R, delta != 0))
@@ -219,171 +543,231 @@ def impl_rgb2hls(image: np.ndarray) -> np.ndarray:
     H[all_eq] = 0
     H[H < 0] += 360 
     
-    if image.dtype != float:
-        return np.uint8(merge([H / 2, L * 255, S * 255]))
+    if not is_float:
+        H /= 2
+        L *= 255
+        S *= 255
+        return _merge_into([H, L, S], "uint8", out)
     else:
-        return merge([H, L, S])
+        return _merge_into([H, L, S], image.dtype, out)
 
-def impl_hls2rgb(image: np.ndarray) -> np.ndarray:
+def impl_hls2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """HLS2RGB
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    if image.dtype != float:
-        image_float = image.astype("float64")
+    is_float = np.issubdtype(image.dtype, np.floating)
+    dtype = working_dtype(image.dtype, precision)
+    if not is_float:
+        image_float = image.astype(dtype)
         image_float[..., 0] *= 2
-        image_float[..., 1:] = image_float[..., 1:] / 255
+        image_float[..., 1:] /= 255
     else:
-        image_float = image.copy()
+        image_float = image.astype(dtype, copy=False)
     
     H, L, S = split(image_float)
     
-    result = np.zeros(image.shape, dtype="float64")
     C = S * (1 - np.abs(2 * L - 1))
-    X = C * (1 - np.abs(((H / 60) % 2) - 1))
     M = L - (C / 2)
     
-    mask = H < 60
-    result[mask] = np.dstack([C[mask], X[mask], np.zeros_like(C[mask])])
-    
-    mask = np.bitwise_and(H >= 60, H < 120)
-    result[mask] = np.dstack([X[mask], C[mask], np.zeros_like(C[mask])])
-    
-    mask = np.bitwise_and(H >= 120, H < 180)
-    result[mask] = np.dstack([np.zeros_like(C[mask]), C[mask], X[mask]])
-    
-    mask = np.bitwise_and(H >= 180, H < 240)
-    result[mask] = np.dstack([np.zeros_like(C[mask]), X[mask], C[mask]])
+    return _hue_to_rgb(H, C, M, image.dtype if is_float else "uint8", out)
     
-    mask = np.bitwise_and(H >= 240, H < 300)
-    result[mask] = np.dstack([X[mask], np.zeros_like(C[mask]), C[mask]])
-    
-    mask = H >= 300
-    result[mask] = np.dstack([C[mask], np.zeros_like(C[mask]), X[mask]])
-    
-    result += merge([M] * 3)   
-
-    if image.dtype != float:
-        return np.uint8(result * 255)
-    else:
-        return result
-    
-def impl_rgb2xyz(image: np.ndarray) -> np.ndarray:
+def impl_rgb2xyz(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2XYZ
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    if image.dtype != float:
-        R, G, B = split(image.astype("float64") / 255)
-    else:
-        R, G, B = split(image)
-      
-    X = 0.412453 * R + 0.357580 * G + 0.180423 * B
-    Y = 0.212671 * R + 0.715160 * G + 0.072169 * B
-    Z = 0.019334 * R + 0.119193 * G + 0.950227 * B
-    
-    if image.dtype != float:
-        return np.uint8(clip_to_range(merge([X, Y, Z]), 0, 1) * 255)
-    else:
-        return merge([X, Y, Z])
+    return _apply_linear(image, linear_transforms[cts.COLOR_RGB2XYZ], out, precision)
     
-def impl_xyz2rgb(image: np.ndarray) -> np.ndarray:
+def impl_xyz2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """XYZ2RGB
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    if image.dtype != float:
-        X, Y, Z = split(image.astype("float64"))
-    else:
-        X, Y, Z = split(image)
-        
-    R = 3.240479 * X - 1.53715 * Y - 0.498535 * Z
-    G = -0.969256 * X + 1.875991 * Y + 0.041556 * Z
-    B = 0.055648 * X - 0.204043 * Y + 1.057311 * Z
-    
-    result = merge([R, G, B])
-    if image.dtype != float:
-        return np.uint8(clip_to_range(result, 0, 255))
-    else:
-        return clip_to_range(result, 0, 1)
+    return _apply_linear(image, linear_transforms[cts.COLOR_XYZ2RGB], out, precision)
     
-def impl_rgb2lab(image: np.ndarray) -> np.ndarray:
+def impl_rgb2lab(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2Lab
+    sRGB (D65) to CIE L*a*b*. Float output has L in [0, 100] and a, b 
+    roughly in [-127, 127]; uint8 output stores L * 255 / 100, a + 128
+    and b + 128
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return image
+    dtype = working_dtype(image.dtype, precision)
+    integer = np.issubdtype(image.dtype, np.integer)
+    
+    def convert(block):
+        xyz = _rgb_block_to_xyz(block, dtype)
+        xyz /= _WHITE.astype(dtype)
+        f = np.where(xyz > _EPSILON, np.cbrt(xyz), 7.787 * xyz + 16 / 116)
+        lab = np.empty_like(f)
+        lab[:, 0] = 116 * f[:, 1] - 16
+        lab[:, 1] = 500 * (f[:, 0] - f[:, 1])
+        lab[:, 2] = 200 * (f[:, 1] - f[:, 2])
+        if integer:
+            lab[:, 0] *= 255 / 100
+            lab[:, 1:] += 128
+        return lab
+    
+    return _blockwise(image, convert, 3, image.dtype if not integer else "uint8", out)
 
-def impl_lab2rgb(image: np.ndarray) -> np.ndarray:
+def impl_lab2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """Lab2RGB
+    Inverse of impl_rgb2lab (same value ranges)
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return image
+    dtype = working_dtype(image.dtype, precision)
+    integer = np.issubdtype(image.dtype, np.integer)
+    
+    def convert(block):
+        lab = block.astype(dtype)
+        if integer:
+            lab[:, 0] *= 100 / 255
+            lab[:, 1:] -= 128
+        f = np.empty_like(lab)
+        f[:, 1] = (lab[:, 0] + 16) / 116
+        f[:, 0] = f[:, 1] + lab[:, 1] / 500
+        f[:, 2] = f[:, 1] - lab[:, 2] / 200
+        xyz = np.where(f > 6 / 29, f ** 3, (f - 16 / 116) / 7.787)
+        xyz *= _WHITE.astype(dtype)
+        rgb = _xyz_block_to_rgb(xyz)
+        if integer:
+            rgb *= 255
+        return rgb
+    
+    return _blockwise(image, convert, 3, image.dtype if not integer else "uint8", out)
 
-def impl_rgb2ycrcb(image: np.ndarray) -> np.ndarray:
+def impl_rgb2ycrcb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2YCrCb
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return image
+    return _apply_linear(image, linear_transforms[cts.COLOR_RGB2YCrCb], out, precision)
 
-def impl_ycrcb2rgb(image: np.ndarray) -> np.ndarray:
+def impl_ycrcb2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """YCrCb2RGB
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return image
+    return _apply_linear(image, linear_transforms[cts.COLOR_YCrCb2RGB], out, precision)
 
-def impl_rgb2luv(image: np.ndarray) -> np.ndarray:
+def impl_rgb2luv(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """RGB2Luv
+    sRGB (D65) to CIE L*u*v*. Float output has L in [0, 100], u in 
+    [-134, 220] and v in [-140, 122]; uint8 output stores L * 255 / 100,
+    (u + 134) * 255 / 354 and (v + 140) * 255 / 262
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return image
+    dtype = working_dtype(image.dtype, precision)
+    integer = np.issubdtype(image.dtype, np.integer)
+    
+    def convert(block):
+        xyz = _rgb_block_to_xyz(block, dtype)
+        X, Y, Z = xyz[:, 0], xyz[:, 1], xyz[:, 2]
+        denominator = X + 15 * Y + 3 * Z
+        np.divide(1, denominator, out=denominator, where=denominator > 0)
+        luv = np.empty_like(xyz)
+        luv[:, 0] = _lightness(Y)
+        luv[:, 1] = 13 * luv[:, 0] * (4 * X * denominator - _UV_WHITE[0])
+        luv[:, 2] = 13 * luv[:, 0] * (9 * Y * denominator - _UV_WHITE[1])
+        if integer:
+            luv[:, 0] *= 255 / 100
+            luv[:, 1] = (luv[:, 1] + 134) * (255 / 354)
+            luv[:, 2] = (luv[:, 2] + 140) * (255 / 262)
+        return luv
+    
+    return _blockwise(image, convert, 3, image.dtype if not integer else "uint8", out)
 
-def impl_luv2rgb(image: np.ndarray) -> np.ndarray:
+def impl_luv2rgb(image: np.ndarray, out: np.ndarray = None, precision: int = None) -> np.ndarray:
     """Luv2RGB
+    Inverse of impl_rgb2luv (same value ranges)
 
     Args:
         image (np.ndarray): Input image
+        out (np.ndarray, optional): Output buffer (may be image itself). Defaults to None.
+        precision (int, optional): Working precision (see utils.set_precision). Defaults to None.
 
     Returns:
         np.ndarray: Converted Image
     """
-    return image
+    dtype = working_dtype(image.dtype, precision)
+    integer = np.issubdtype(image.dtype, np.integer)
+    
+    def convert(block):
+        luv = block.astype(dtype)
+        if integer:
+            luv[:, 0] *= 100 / 255
+            luv[:, 1] = luv[:, 1] * (354 / 255) - 134
+            luv[:, 2] = luv[:, 2] * (262 / 255) - 140
+        L = luv[:, 0]
+        scale = 13 * L
+        np.divide(1, scale, out=scale, where=L > 0)
+        u = luv[:, 1] * scale + _UV_WHITE[0]
+        v = luv[:, 2] * scale + _UV_WHITE[1]
+        Y = np.where(L > 8, ((L + 16) / 116) ** 3, L / _KAPPA)
+        ratio = np.zeros_like(Y)
+        np.divide(Y, 4 * v, out=ratio, where=v > 0)
+        xyz = np.empty_like(luv)
+        xyz[:, 0] = 9 * u * ratio
+        xyz[:, 1] = Y
+        xyz[:, 2] = (12 - 3 * u - 20 * v) * ratio
+        rgb = _xyz_block_to_rgb(xyz)
+        if integer:
+            rgb *= 255
+        return rgb
+    
+    return _blockwise(image, convert, 3, image.dtype if not integer else "uint8", out)
 
 conversion_methods = {
     cts.COLOR_RGB2BGR:  impl_invert_order,
@@ -406,25 +790,159 @@ conversion_methods = {
     cts.COLOR_Luv2RGB:    impl_luv2rgb
 }
 
-def convert_color(image: np.ndarray, mode: int) -> np.ndarray:
+# conversions that can be served from a lookup table for uint8 input
+lut_modes = {
+    cts.COLOR_RGB2HSV,
+    cts.COLOR_RGB2HLS,
+    cts.COLOR_RGB2XYZ,
+    cts.COLOR_RGB2Lab,
+    cts.COLOR_Lab2RGB,
+    cts.COLOR_RGB2Luv,
+    cts.COLOR_Luv2RGB
+}
+
+# lut_modes smooth enough over the RGB cube to interpolate (lut_step > 1). 
+# Hue wraps around and saturation jumps near black, and the inverse 
+# conversions clip out of gamut colors, so tables of those must be exact
+lut_interpolated_modes = {
+    cts.COLOR_RGB2XYZ,
+    cts.COLOR_RGB2Lab,
+    cts.COLOR_RGB2Luv
+}
+
+def _convert_planar(image: np.ndarray, mode: int, out: np.ndarray, **options) -> np.ndarray:
+    """convert_color for planar images: the conversion runs on interleaved
+    views of the planes and writes straight into a planar output buffer
+    """
+    source = image if mode == cts.COLOR_GRAY2RGB else np.moveaxis(image, -3, -1)
+    if out is None:
+        # the result's channels and dtype, from a single pixel
+        pixel = source[(0,) * (len(source.shape) - (mode != cts.COLOR_GRAY2RGB))]
+        sample = _convert_color(pixel[np.newaxis, np.newaxis], mode, 
+                                precision=options["precision"])
+        planes = source.shape if mode == cts.COLOR_GRAY2RGB else source.shape[:-1]
+        if mode != cts.COLOR_RGB2GRAY:
+            planes = planes[:-2] + sample.shape[-1:] + planes[-2:]
+        out = np.empty(planes, dtype=sample.dtype)
+    target = out if mode == cts.COLOR_RGB2GRAY else np.moveaxis(out, -3, -1)
+    _convert_color(source, mode, out=target, **options)
+    return out
+
+@instrumented("convert_color", describe_conversion)
+def convert_color(image: np.ndarray, mode: int, out: np.ndarray = None, 
+                  inplace: bool = False, use_lut: bool = False, 
+                  lut_step: int = 1, alpha=None, tile_shape: tuple = None,
+                  precision: int = None, threads: int = None, 
+                  layout: int = cts.LAYOUT_INTERLEAVED) -> np.ndarray:
     """Color conversion. Options for mode are
             COLOR_RGB2BGR, COLOR_BGR2RGB, COLOR_RGB2GRAY
             COLOR_GRAY2RGB, COLOR_RGB2RGBA, COLOR_RGBA2RGB
             COLOR_RGB2HSV, COLOR_HSV2RGB, COLOR_RGB2HSL
             COLOR_HSL2RGB, COLOR_RGB2XYZ, COLOR_XYZ2RGB
+            COLOR_RGB2YCrCb, COLOR_YCrCb2RGB, COLOR_RGB2Lab
+            COLOR_Lab2RGB, COLOR_RGB2Luv, COLOR_Luv2RGB
 
     * more options to be implemented in the future
+
+    Any number of leading batch dimensions is accepted (channels are
+    always the last axis), so a stack of N frames (N x H x W x C) is 
+    converted in a single vectorized call. Grayscale inputs have no 
+    channel axis (N x H x W).
+
+    The result can be written to a preallocated buffer (out) or on top 
+    of the input itself (inplace), as long as the buffer has the shape 
+    of the result and a dtype the result can be cast to. For 
+    COLOR_RGBA2RGB, inplace returns a view of the color channels.
+
+    With use_lut, uint8 conversions in lut_modes are served from a 
+    lookup table built on first use (see image_processing.lut). A 
+    lut_step of 1 gives exact results. Larger steps use smaller tables 
+    and trilinear interpolation (within a few levels), which is only 
+    allowed for lut_interpolated_modes. Tables are computed in float64 
+    whatever the precision. Other modes and dtypes ignore use_lut.
+
+    For COLOR_RGB2RGBA, alpha sets the new channel (a scalar or a plane
+    matching the image without its channel axis). It defaults to opaque.
+
+    With tile_shape, the image is converted tile by tile (see 
+    utils.process_tiled) so memory use is bounded by the tile size. 
+    Combined with out, this works on np.memmap inputs and outputs.
+
+    With layout set to LAYOUT_PLANAR, images (and out) are ... x C x H x W
+    and the result is a contiguous planar array. Planar inputs are 
+    converted plane by plane without reordering them in memory.
+
+    Float images (any precision) are expected in [0, 1] and keep their 
+    dtype, integer images are expected in [0, 255] and give uint8 results.
     
     Args:
-        image (np.ndarray): Input image
+        image (np.ndarray): Input image (... x H x W x C)
         mode (int): Color conversion flag. (COLOR_ prefix)
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+        inplace (bool, optional): Write the result to image. Defaults to False.
+        use_lut (bool, optional): Use a lookup table if possible. Defaults to False.
+        lut_step (int, optional): Sampling step of the table (divides 255). Defaults to 1.
+        alpha (optional): Alpha channel for COLOR_RGB2RGBA. Defaults to None.
+        tile_shape (tuple, optional): Convert in tiles of this size. Defaults to None.
+        precision (int, optional): Working precision of float intermediates 
+            (PRECISION_ prefix), the utils.set_precision default if None. 
+            PRECISION_FIXED selects integer kernels for uint8 gray, XYZ and 
+            YCrCb conversions. Defaults to None.
+        threads (int, optional): Split the leading axis across this many 
+            threads (see utils.set_num_threads). Results are identical to 
+            the serial path. Defaults to None.
+        layout (int, optional): Channel layout of image and result 
+            (LAYOUT_ prefix). Defaults to LAYOUT_INTERLEAVED.
+
+    Raises:
+        RuntimeError: If mode is not a valid conversion
+        ValueError: If both out and inplace are given, out has the wrong shape
+            or lut_step > 1 is used for a mode that can't be interpolated
+        TypeError: If the result can't be cast to out's dtype
 
     Returns:
-        np.ndarray: Converted image
+        np.ndarray: Converted image (out, if given)
     """
     if not mode in conversion_methods.keys():
         raise RuntimeError(f"Conversion {mode} is not available or not a valid option.")
-    return conversion_methods[mode](image)
+    if inplace:
+        if out is not None:
+            raise ValueError("Arguments 'out' and 'inplace' are mutually exclusive.")
+        if mode == cts.COLOR_RGBA2RGB:
+            return image[..., :3, :, :] if layout == cts.LAYOUT_PLANAR else image[..., :3]
+        out = image
+    if layout == cts.LAYOUT_PLANAR:
+        return _convert_planar(image, mode, out, use_lut=use_lut, lut_step=lut_step, alpha=alpha,
+                               tile_shape=tile_shape, precision=precision, threads=threads)
+    if layout != cts.LAYOUT_INTERLEAVED:
+        raise RuntimeError(f"Layout {layout} is not a valid option.")
+    if tile_shape is not None:
+        if alpha is not None and np.ndim(alpha) > 0:
+            raise ValueError("Alpha planes are not supported when converting in tiles.")
+        convert = lambda tile: _convert_color(tile, mode, use_lut=use_lut, lut_step=lut_step, 
+                                              alpha=alpha, precision=precision, threads=threads)
+        return process_tiled(image, convert, tile_shape, out=out)
+    threads = threads or get_num_threads()
+    if threads > 1 and len(image.shape) > 2:
+        if alpha is not None and np.ndim(alpha) > 0:
+            raise ValueError("Alpha planes are not supported when converting in parallel.")
+        convert = lambda band, out=None: _convert_color(band, mode, out=out, use_lut=use_lut, 
+                                                        lut_step=lut_step, alpha=alpha, 
+                                                        precision=precision, threads=1)
+        return process_parallel(image, convert, threads, out=out)
+    if use_lut and mode in lut_modes and image.dtype == np.uint8:
+        if lut_step != 1 and mode not in lut_interpolated_modes:
+            raise ValueError(f"Conversion {mode} can only use exact lookup tables (lut_step = 1).")
+        # tables are shared by every precision, so they're built in float64
+        build = functools.partial(conversion_methods[mode], precision=cts.PRECISION_FLOAT64)
+        table = lut.get_lut(mode, build, lut_step)
+        return lut.apply_lut(image, table, out=out)
+    if mode == cts.COLOR_RGB2RGBA:
+        return impl_rgb2rgba(image, out=out, alpha=alpha)
+    return conversion_methods[mode](image, out=out, precision=precision)
+
+# convert_color without instrumentation, for its own nested calls
+_convert_color = convert_color.__wrapped__
 
 __all__ = [
     "convert_color"
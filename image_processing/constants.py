@@ -26,6 +26,22 @@ SOFTWARE.
 READ_COLOR = 0
 READ_GRAY = 1
 
+# Existing files when writing (OVERWRITE)
+OVERWRITE_ALLOW = 0
+OVERWRITE_WARN = 1
+OVERWRITE_SKIP = 2
+OVERWRITE_ERROR = 3
+
+# Working precision of float intermediates (PRECISION)
+PRECISION_AUTO = 0
+PRECISION_FLOAT32 = 1
+PRECISION_FLOAT64 = 2
+PRECISION_FIXED = 3
+
+# Memory layout of the channels (LAYOUT)
+LAYOUT_INTERLEAVED = 0  # ... x H x W x C
+LAYOUT_PLANAR = 1  # ... x C x H x W
+
 # Color conversion (COLOR)
 COLOR_RGB2BGR = 0
 COLOR_BGR2RGB = 1
@@ -23,54 +23,674 @@ SOFTWARE.
 """
 
 # site-packages
-import matplotlib.image as mpimg
 import numpy as np
 
 # local
 import image_processing.color_conversion as ccv
 import image_processing.constants as cts
+from image_processing.utils import convert_dtype
+from image_processing.instrumentation import instrumented, describe_read, describe_write
 
 # native
+import glob
+import json
 import os
+import importlib
+import stat
+import struct
+import threading
 import warnings
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 
 
-def read_image(path: str, mode: int = cts.READ_COLOR) -> np.ndarray:
+# Raw format: magic, header length (uint32, little endian), JSON header
+# (shape, dtype, color_space) padded so data starts on a RAW_ALIGNMENT 
+# boundary, then the pixels in C order. It can be opened with np.memmap
+RAW_EXTENSION = ".ipr"
+RAW_MAGIC = b"IPNRAW01"
+RAW_ALIGNMENT = 64
+
+# I/O backends by name: extensions (None for any), reader(path) and 
+# writer(image, path) -> bool (False if it can't encode that image).
+# Partial readers also take region, scale and gray keywords (see 
+# read_image). They are tried in backend_order; see register_backend
+io_backends = {}
+backend_order = []
+
+# Decoded images by (path, mtime, size, read options), least recently used
+# first. Off until set_decode_cache_size is given a positive bound
+_decode_cache = OrderedDict()
+_decode_cache_nbytes = 0
+_decode_cache_max_nbytes = 0
+_decode_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_decode_cache_lock = threading.Lock()
+
+
+def _import_optional(name: str):
+    """Imports a module on first use, returning None if it isn't installed
+    """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+def register_backend(name: str, reader=None, writer=None, extensions=None, 
+                     available=None, first: bool = False, partial: bool = False) -> None:
+    """Registers (or replaces) an I/O backend
+
+    Args:
+        name (str): Backend name
+        reader (callable, optional): reader(path) -> np.ndarray. Defaults to None.
+        writer (callable, optional): writer(image, path) -> bool. Defaults to None.
+        extensions (set, optional): Lower case extensions handled, None for all. Defaults to None.
+        available (callable, optional): Returns whether the backend can be used. Defaults to None.
+        first (bool, optional): Try it before the existing backends. Defaults to False.
+        partial (bool, optional): The reader takes region, scale and gray 
+            keywords and applies them itself. Otherwise the full decode is
+            cropped and scaled afterwards. Defaults to False.
+    """
+    io_backends[name] = {
+        "reader": reader,
+        "writer": writer,
+        "extensions": extensions,
+        "available": available or (lambda: True),
+        "partial": partial
+    }
+    if name in backend_order:
+        backend_order.remove(name)
+    if first:
+        backend_order.insert(0, name)
+    else:
+        backend_order.append(name)
+
+def _backends_for(path: str, role: str, backend: str = None) -> list:
+    """Entries of the backends able to handle path for role ("reader" or "writer")
+    """
+    extension = os.path.splitext(path)[1].lower()
+    names = backend_order if backend is None else [backend]
+    found = []
+    for name in names:
+        entry = io_backends[name]
+        if entry[role] is None:
+            continue
+        if entry["extensions"] is not None and extension not in entry["extensions"]:
+            continue
+        if entry["available"]():
+            found.append(entry)
+    if not found:
+        raise RuntimeError(f"No I/O backend available for {path}.")
+    return found
+
+def _scaled_size(shape: tuple, scale: float) -> tuple:
+    """Rows and columns of a read of the given shape at scale
+    """
+    if scale is None or scale == 1:
+        return tuple(shape[:2])
+    if not 0 < scale < 1:
+        raise ValueError(f"Read scale must be in (0, 1] (got {scale}).")
+    return tuple(max(int(round(n * scale)), 1) for n in shape[:2])
+
+def _box_bounds(start: int, length: int, count: int) -> tuple:
+    """First and past the last pixel (relative to start) of each of count 
+    boxes splitting [start, start + length). A pixel belongs to the box its
+    center falls in, with the floating point arithmetic of Pillow's BOX 
+    filter so ties are broken the same way
+    """
+    scale = length / count
+    support = scale / 2
+    center = start + (np.arange(count) + 0.5) * scale
+    first = np.maximum((center - support + 0.5).astype("intp"), 0)
+    pixels = first[:, np.newaxis] + np.arange(int(np.ceil(2 * support)) + 2)
+    t = (pixels - center[:, np.newaxis] + 0.5) * (1 / scale)
+    inside = (t > -0.5) & (t <= 0.5) & (pixels < start + length)
+    stop = np.where(inside, pixels + 1, 0).max(axis=1)
+    first = np.where(inside, pixels, np.iinfo("intp").max).min(axis=1)
+    return first - start, stop - start
+
+def _scale_array(image: np.ndarray, size: tuple, origin: tuple = (0, 0)) -> np.ndarray:
+    """Shrinks the first two axes to size by averaging the pixels of each
+    output pixel's box (see _box_bounds), as Pillow's BOX resize does. 
+    origin is the position of image in the full decode, which the bounds
+    depend on through rounding. Returns the input if it already has that size
+    """
+    if tuple(image.shape[:2]) == tuple(size):
+        return image
+    (top, bottom), (left, right) = (_box_bounds(start, n, count) 
+                                    for start, n, count in zip(origin, image.shape[:2], size))
+    # reduceat is slow along the outer axis, so rows are summed band by band
+    sums = np.zeros((size[0], image.shape[1] + 1) + image.shape[2:], dtype="float64")
+    for i in range(size[0]):
+        np.add.reduce(image[top[i]:bottom[i]], axis=0, dtype="float64", out=sums[i, 1:])
+    np.cumsum(sums, axis=1, out=sums)
+    result = np.take(sums, right, axis=1)
+    result -= np.take(sums, left, axis=1)
+    counts = np.outer(bottom - top, right - left)
+    result /= counts.reshape(counts.shape + (1,) * (image.ndim - 2))
+    if np.issubdtype(image.dtype, np.integer):
+        np.rint(result, out=result)
+    return result.astype(image.dtype)
+
+def _check_region(region: tuple, shape: tuple) -> tuple:
+    """Validates a read region against the image's rows and columns
+    """
+    if region is None:
+        return (0, 0) + tuple(shape[:2])
+    top, left, rows, columns = map(int, region)
+    if (min(top, left) < 0 or min(rows, columns) < 1 
+            or top + rows > shape[0] or left + columns > shape[1]):
+        raise ValueError(f"Read region {tuple(region)} is outside the image {tuple(shape[:2])}.")
+    return top, left, rows, columns
+
+def _crop_and_scale(image: np.ndarray, region: tuple, scale: float) -> np.ndarray:
+    """Applies read_image's region and scale to a fully decoded image
+    (memory-mapped images are only read inside the region)
+    """
+    top, left, rows, columns = _check_region(region, image.shape)
+    if region is not None:
+        image = image[top:top + rows, left:left + columns]
+    return _scale_array(image, _scaled_size(image.shape, scale), (top, left))
+
+def _read_raw_backend(path: str) -> np.ndarray:
+    """Maps raw and .npy files (read-only)
+    """
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    return read_raw(path)
+
+def _write_raw_backend(image: np.ndarray, path: str) -> bool:
+    """Stores the array as is in raw or .npy files
+    """
+    if path.lower().endswith(".npy"):
+        np.save(path, image)
+    else:
+        write_raw(image, path)
+    return True
+
+def _read_pillow(path: str, region: tuple = None, scale: float = None, 
+                 gray: bool = False) -> np.ndarray:
+    """Decodes with Pillow, matching matplotlib's imread output (PNGs as 
+    float32 in [0, 1], anything else as integers)
+    JPEGs are decoded at the smallest DCT scaling (1/2, 1/4 or 1/8) still
+    covering twice the requested size, and straight to luma if gray is set. The
+    region is then cropped and box filtered to size in a single resize
+    """
+    PILImage = _import_optional("PIL.Image")
+    with PILImage.open(path) as image:
+        is_png = image.format == "PNG"
+        width, height = image.size
+        top, left, rows, columns = _check_region(region, (height, width))
+        size = _scaled_size((rows, columns), scale)
+        if image.format == "JPEG" and (gray or size != (rows, columns)):
+            # decoding at twice the target size keeps the DCT scaling from
+            # visibly shifting the box filter (Pillow's thumbnail does the same)
+            image.draft("L" if gray else image.mode, 
+                        (-(-2 * width * size[1] // columns), -(-2 * height * size[0] // rows)))
+        # low bit depth grayscale PNGs are unpacked to [0, 2^bits - 1]
+        rawmode = getattr(getattr(image, "png", None), "im_rawmode", None)
+        modes = ("1", "L", "RGB", "RGBA") if is_png else ("L", "RGB", "RGBA", "RGBX")
+        if image.mode not in modes and not image.mode.startswith("I;16"):
+            image = image.convert("RGBA")
+        
+        # the draft may have shrunk the image, so the box is rescaled to it
+        fx, fy = image.size[0] / width, image.size[1] / height
+        box = (left * fx, top * fy, (left + columns) * fx, (top + rows) * fy)
+        if box == (0, 0) + image.size and size == image.size[::-1]:
+            array = np.asarray(image)
+        elif image.mode.startswith("I;16"):
+            # Pillow's 16 bit resampling isn't reliable: crop and scale as arrays
+            array = np.asarray(image)[top:top + rows, left:left + columns]
+            array = _scale_array(array, size, (top, left))
+        else:
+            if image.mode == "1":
+                image = image.convert("L")
+            array = np.asarray(image.resize(size[::-1], PILImage.BOX, box=box))
+    if array.dtype.byteorder == ">":
+        array = array.astype(array.dtype.newbyteorder("="))
+    if not is_png:
+        return array
+    if array.dtype == bool:
+        return array.astype("float32")
+    maximum = {"L;2": 3, "L;4": 15}.get(rawmode, np.iinfo(array.dtype).max)
+    return np.divide(array, maximum, dtype="float32")
+
+def _write_pillow(image: np.ndarray, path: str) -> bool:
+    """Encodes uint8 gray and RGB(A) arrays with Pillow, without colormap handling
+    """
+    if image.dtype != np.uint8:
+        return False
+    if len(image.shape) != 2 and (len(image.shape) != 3 or image.shape[2] not in (3, 4)):
+        return False
+    if len(image.shape) == 3 and image.shape[2] == 4 and path.lower().endswith((".jpg", ".jpeg")):
+        return False
+    PILImage = _import_optional("PIL.Image")
+    PILImage.fromarray(np.ascontiguousarray(image)).save(path)
+    return True
+
+def _read_matplotlib(path: str) -> np.ndarray:
+    """Decodes with matplotlib's imread
+    """
+    return importlib.import_module("matplotlib.image").imread(path)
+
+def _write_matplotlib(image: np.ndarray, path: str) -> bool:
+    """Wraps matplotlib's imsave (gray colormap, ignored for RGB)
+    """
+    importlib.import_module("matplotlib.image").imsave(path, image, cmap="gray")
+    return True
+
+register_backend("raw", _read_raw_backend, _write_raw_backend, {RAW_EXTENSION, ".npy"})
+register_backend("pillow", _read_pillow, _write_pillow, partial=True,
+                 available=lambda: _import_optional("PIL.Image") is not None)
+register_backend("matplotlib", _read_matplotlib, _write_matplotlib,
+                 available=lambda: _import_optional("matplotlib.image") is not None)
+
+
+@instrumented("read_image", describe_read)
+def read_image(path: str, mode: int = cts.READ_COLOR, backend: str = None, 
+               dtype=None, use_cache: bool = True, region: tuple = None,
+               scale: float = None) -> np.ndarray:
     """Reads image
-    Extension is automatically detected
+    Extension is automatically detected and the first suitable backend in
+    backend_order is used (raw and .npy files are memory-mapped read-only,
+    other formats are decoded by Pillow, or matplotlib if it's missing)
+
+    A region and a scale read a crop and/or a box filtered reduction, 
+    before any dtype or color conversion. Pillow decodes JPEGs at reduced
+    resolution (DCT scaling) and, for READ_GRAY, straight to luma, so 
+    thumbnails cost a fraction of a full decode. Other backends decode
+    the whole image and crop it (raw files only read the region's rows).
+
+    If the decode cache is on (see set_decode_cache_size), decoded images 
+    are kept and returned again while the file's modification time and 
+    size don't change. Cached images are read-only, copy them to modify.
 
     Args:
         path (str): Path to input image
         mode (int): Image reading mode. Options are
                 READ_COLOR, READ_GRAY
+        backend (str, optional): Name of the backend to use. Defaults to None.
+        dtype (optional): Pixel type of the result (floats in [0, 1], integers
+            in [0, max]), as decoded if None. Defaults to None.
+        use_cache (bool, optional): Use the decode cache if it's on. Defaults to True.
+        region (tuple, optional): (top, left, height, width) in full resolution
+            pixels, the whole image if None. Defaults to None.
+        scale (float, optional): Size factor in (0, 1] applied to the region, 
+            result sides are rounded (at least 1 pixel). Defaults to None.
 
     Raises:
         FileNotFoundError: If the image cannot be found on 'path'
+        ValueError: If region isn't inside the image or scale isn't in (0, 1]
 
     Returns:
         np.ndarray: Image as array
     """
-    if not os.path.isfile(path):
+    try:
+        info = os.stat(path)
+    except OSError:
+        info = None
+    if info is None or not stat.S_ISREG(info.st_mode):
         raise FileNotFoundError(f"Can't find image file ({path}).")
-    image = mpimg.imread(path)
+    
+    key = None
+    if use_cache and _decode_cache_max_nbytes > 0:
+        key = (os.path.abspath(path), info.st_mtime_ns, info.st_size, mode, backend,
+               None if dtype is None else np.dtype(dtype).str, 
+               None if region is None else tuple(region), scale)
+        image = _cache_lookup(key)
+        if image is not None:
+            return image
+    
+    entry = _backends_for(path, "reader", backend)[0]
+    gray = mode == cts.READ_GRAY
+    if entry["partial"] and (region is not None or scale is not None or gray):
+        image = entry["reader"](path, region=region, scale=scale, gray=gray)
+    elif region is not None or scale is not None:
+        image = _crop_and_scale(entry["reader"](path), region, scale)
+    else:
+        image = entry["reader"](path)
+    if dtype is not None:
+        image = convert_dtype(image, dtype)
     if len(image.shape) > 2 and mode == cts.READ_GRAY:
-        image = ccv.convert_color(image, cts.COLOR_RGB2GRAY)
+        image = ccv._convert_color(image, cts.COLOR_RGB2GRAY)
+    if key is not None and not isinstance(image, np.memmap):
+        image.setflags(write=False)
+        _cache_store(key, image)
     return image
 
-def write_image(image: np.ndarray, path: str):
+def _cache_lookup(key: tuple) -> np.ndarray:
+    """Returns a cached image (marking it recently used), or None
+    """
+    with _decode_cache_lock:
+        image = _decode_cache.get(key)
+        if image is None:
+            _decode_cache_stats["misses"] += 1
+            return None
+        _decode_cache.move_to_end(key)
+        _decode_cache_stats["hits"] += 1
+        return image
+
+def _cache_store(key: tuple, image: np.ndarray) -> None:
+    """Adds an image to the decode cache, evicting old ones to make room
+    """
+    global _decode_cache_nbytes
+    with _decode_cache_lock:
+        if key in _decode_cache or image.nbytes > _decode_cache_max_nbytes:
+            return
+        _decode_cache[key] = image
+        _decode_cache_nbytes += image.nbytes
+        _evict_decoded()
+
+def _evict_decoded() -> None:
+    """Drops least recently used images until the cache fits its bound
+    (caller must hold the lock)
+    """
+    global _decode_cache_nbytes
+    while _decode_cache_nbytes > _decode_cache_max_nbytes:
+        _, image = _decode_cache.popitem(last=False)
+        _decode_cache_nbytes -= image.nbytes
+        _decode_cache_stats["evictions"] += 1
+
+def set_decode_cache_size(nbytes: int) -> None:
+    """Sets the memory bound of the read_image decode cache (0, the 
+    default, turns it off and empties it)
+
+    Args:
+        nbytes (int): Maximum total size of the cached images in bytes
+    """
+    global _decode_cache_max_nbytes
+    with _decode_cache_lock:
+        _decode_cache_max_nbytes = max(int(nbytes), 0)
+        _evict_decoded()
+
+def clear_decode_cache() -> None:
+    """Drops every cached image and resets the statistics
+    """
+    global _decode_cache_nbytes
+    with _decode_cache_lock:
+        _decode_cache.clear()
+        _decode_cache_nbytes = 0
+        _decode_cache_stats.update(hits=0, misses=0, evictions=0)
+
+def decode_cache_info() -> dict:
+    """Statistics of the decode cache
+
+    Returns:
+        dict: hits, misses, evictions, entries, nbytes and max_nbytes
+    """
+    with _decode_cache_lock:
+        return dict(_decode_cache_stats, entries=len(_decode_cache), 
+                    nbytes=_decode_cache_nbytes, max_nbytes=_decode_cache_max_nbytes)
+
+@instrumented("write_image", describe_write)
+def write_image(image: np.ndarray, path: str, overwrite: int = cts.OVERWRITE_WARN,
+                backend: str = None) -> bool:
     """Writes image
-    Wraps matplotlib's imsave function. The gray colormap application is 
-    ignored if image is RGB
+    The first backend in backend_order able to encode the image is used:
+    raw and .npy paths store the array as is, uint8 gray and RGB(A) 
+    images are handed to Pillow directly and anything else goes through matplotlib's
+    imsave (the gray colormap application is ignored if image is RGB)
     
     Args:
         image (np.ndarray): Image as array
         path (str): Path to output image
+        overwrite (int, optional): What to do if path exists. Options are
+                OVERWRITE_ALLOW, OVERWRITE_WARN, OVERWRITE_SKIP, OVERWRITE_ERROR
+                Defaults to OVERWRITE_WARN.
+        backend (str, optional): Name of the backend to use. Defaults to None.
+
+    Raises:
+        FileExistsError: If path exists and overwrite is OVERWRITE_ERROR
+
+    Returns:
+        bool: Whether the file was written
     """
-    if os.path.isfile(path):
+    if overwrite != cts.OVERWRITE_ALLOW and os.path.isfile(path):
+        if overwrite == cts.OVERWRITE_SKIP:
+            return False
+        if overwrite == cts.OVERWRITE_ERROR:
+            raise FileExistsError(f"Image file already exists ({path}).")
         warnings.warn("File exists. Current file will be overwritten!")
-    mpimg.imsave(path, image, cmap="gray")
+    for entry in _backends_for(path, "writer", backend):
+        if entry["writer"](image, path):
+            return True
+    raise RuntimeError(f"No I/O backend can write this image to {path}.")
+
+class ImageWriter:
+    """Writes images in the background on a thread (or process) pool
+    write() blocks while max_pending images are queued, which bounds the
+    memory held by images waiting to be encoded. Errors raised by the 
+    workers are re-raised by close() (or when leaving a with block)
+
+    Args:
+        workers (int, optional): Number of encoding workers. Defaults to 4.
+        max_pending (int, optional): Maximum images in flight. Defaults to 16.
+        overwrite (int, optional): Policy for existing files (OVERWRITE_ 
+            prefix). Defaults to OVERWRITE_ALLOW.
+        processes (bool, optional): Use processes instead of threads. Defaults to False.
+    """
+    def __init__(self, workers: int = 4, max_pending: int = 16, 
+                 overwrite: int = cts.OVERWRITE_ALLOW, processes: bool = False):
+        executor = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = executor(max_workers=workers)
+        self.overwrite = overwrite
+        self.slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self.errors = []
+        self.written = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+    
+    def write(self, image: np.ndarray, path: str) -> None:
+        """Queues an image to be written
+
+        Args:
+            image (np.ndarray): Image as array (must not be modified until written)
+            path (str): Path to output image
+        """
+        self.slots.acquire()
+        future = self.executor.submit(write_image, image, path, self.overwrite)
+        future.add_done_callback(self._done)
+    
+    def _done(self, future) -> None:
+        """Releases the slot of a finished write and records its outcome
+        """
+        with self.lock:
+            if future.exception() is not None:
+                self.errors.append(future.exception())
+            elif future.result():
+                self.written += 1
+            else:
+                self.skipped += 1
+        self.slots.release()
+    
+    def close(self) -> None:
+        """Waits for every queued write
+
+        Raises:
+            Exception: The first error raised by a worker, if any
+        """
+        self.executor.shutdown(wait=True)
+        if self.errors:
+            raise self.errors[0]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+def write_images(items, workers: int = 4, max_pending: int = 16, 
+                 overwrite: int = cts.OVERWRITE_ALLOW, processes: bool = False) -> int:
+    """Writes many images in parallel (see ImageWriter)
+
+    Args:
+        items (iterable): (image, path) pairs, consumed lazily
+        workers (int, optional): Number of encoding workers. Defaults to 4.
+        max_pending (int, optional): Maximum images in flight. Defaults to 16.
+        overwrite (int, optional): Policy for existing files (OVERWRITE_ 
+            prefix). Defaults to OVERWRITE_ALLOW.
+        processes (bool, optional): Use processes instead of threads. Defaults to False.
+
+    Returns:
+        int: Number of images written (skipped ones excluded)
+    """
+    with ImageWriter(workers, max_pending, overwrite, processes) as writer:
+        for image, path in items:
+            writer.write(image, path)
+    return writer.written
+
+def iter_images(paths, mode: int = cts.READ_COLOR, prefetch: int = 8, 
+                workers: int = 4, ordered: bool = True, dtype=None):
+    """Reads many images, decoding ahead on a thread pool
+    At most prefetch images are decoded (or waiting to be consumed) at a 
+    time, which bounds memory use. Decoding (and READ_GRAY conversion) 
+    happens in the workers
+
+    Args:
+        paths (str or iterable): Glob pattern (sorted) or sequence of paths
+        mode (int, optional): Image reading mode. Defaults to READ_COLOR.
+        prefetch (int, optional): Maximum images in flight. Defaults to 8.
+        workers (int, optional): Number of decoding threads. Defaults to 4.
+        ordered (bool, optional): Yield in input order, otherwise as 
+            decoding completes. Defaults to True.
+        dtype (optional): Pixel type of the images (see read_image). Defaults to None.
+
+    Raises:
+        FileNotFoundError: If an image cannot be found (when it is reached)
+
+    Yields:
+        tuple: (path, image)
+    """
+    if isinstance(paths, str):
+        paths = sorted(glob.glob(paths))
+    paths = iter(paths)
+    prefetch = max(prefetch, 1)
+    
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    
+    def submit() -> bool:
+        path = next(paths, None)
+        if path is None:
+            return False
+        pending.append((path, executor.submit(read_image, path, mode, None, dtype)))
+        return True
+    
+    try:
+        while len(pending) < prefetch and submit():
+            pass
+        while pending:
+            if ordered:
+                path, future = pending.popleft()
+            else:
+                done, _ = wait([f for _, f in pending], return_when=FIRST_COMPLETED)
+                path, future = next(item for item in pending if item[1] in done)
+                pending.remove((path, future))
+            image = future.result()
+            submit()
+            yield path, image
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+def _raw_header(shape: tuple, dtype, color_space: str) -> bytes:
+    """Builds the raw header (magic, length and padded JSON)
+    """
+    info = {"shape": list(shape), "dtype": np.dtype(dtype).str, "color_space": color_space}
+    text = json.dumps(info).encode("ascii")
+    used = len(RAW_MAGIC) + 4 + len(text)
+    text += b" " * (-used % RAW_ALIGNMENT)
+    return RAW_MAGIC + struct.pack("<I", len(text)) + text
+
+def read_raw_info(path: str) -> dict:
+    """Reads the header of a raw image
+
+    Args:
+        path (str): Path to raw image
+
+    Raises:
+        ValueError: If the file is not a raw image
+
+    Returns:
+        dict: shape (tuple), dtype (np.dtype), color_space (str or None) 
+            and offset (int, start of the pixel data)
+    """
+    with open(path, "rb") as file:
+        magic = file.read(len(RAW_MAGIC))
+        if magic != RAW_MAGIC:
+            raise ValueError(f"Not a raw image file ({path}).")
+        length, = struct.unpack("<I", file.read(4))
+        info = json.loads(file.read(length).decode("ascii"))
+    return {
+        "shape": tuple(info["shape"]),
+        "dtype": np.dtype(info["dtype"]),
+        "color_space": info["color_space"],
+        "offset": len(RAW_MAGIC) + 4 + length
+    }
+
+def read_raw(path: str, mode: str = "r") -> np.memmap:
+    """Memory-maps a raw image. Nothing is read until the array is accessed,
+    so slices only touch the pages they need and several processes mapping
+    the same file share it through the page cache
+
+    Args:
+        path (str): Path to raw image
+        mode (str, optional): np.memmap mode ("r", "r+" or "c"). Defaults to "r".
+
+    Raises:
+        FileNotFoundError: If the image cannot be found on 'path'
+
+    Returns:
+        np.memmap: Image as array
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Can't find image file ({path}).")
+    info = read_raw_info(path)
+    return np.memmap(path, dtype=info["dtype"], mode=mode, 
+                     offset=info["offset"], shape=info["shape"])
+
+def create_raw(path: str, shape: tuple, dtype, color_space: str = None) -> np.memmap:
+    """Creates a raw image and maps it for writing (i.e. as the out buffer
+    of convert_color)
+
+    Args:
+        path (str): Path to raw image
+        shape (tuple): Image shape
+        dtype: Image data type
+        color_space (str, optional): Color space name stored in the header. Defaults to None.
+
+    Returns:
+        np.memmap: Writable image
+    """
+    header = _raw_header(shape, dtype, color_space)
+    with open(path, "wb") as file:
+        file.write(header)
+    return np.memmap(path, dtype=dtype, mode="r+", offset=len(header), shape=tuple(shape))
+
+def write_raw(image: np.ndarray, path: str, color_space: str = None) -> None:
+    """Writes an image in the raw format
+
+    Args:
+        image (np.ndarray): Image as array
+        path (str): Path to raw image
+        color_space (str, optional): Color space name stored in the header. Defaults to None.
+    """
+    with open(path, "wb") as file:
+        file.write(_raw_header(image.shape, image.dtype, color_space))
+        np.ascontiguousarray(image).tofile(file)
 
 __all__ = [
     "read_image", 
-    "write_image"
+    "write_image",
+    "iter_images",
+    "write_images",
+    "ImageWriter",
+    "register_backend",
+    "set_decode_cache_size",
+    "clear_decode_cache",
+    "decode_cache_info",
+    "read_raw",
+    "read_raw_info",
+    "create_raw",
+    "write_raw"
 ]
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# site-packages
+import numpy as np
+
+# local
+import image_processing.constants as cts
+
+# native
+import contextlib
+import functools
+import math
+import os
+import threading
+import time
+import tracemalloc
+
+
+# callables receiving one event dict per instrumented call; instrumentation
+# is off (and costs a single flag check) while there are none
+_sinks = []
+_enabled = False
+_trace_memory = False
+_started_tracemalloc = False
+_sinks_lock = threading.Lock()
+
+# flag value -> name, i.e. 6 -> "RGB2HSV"
+_COLOR_NAMES = {value: name[len("COLOR_"):] for name, value in vars(cts).items() 
+                if name.startswith("COLOR_")}
+
+
+def instrumented(operation: str, describe):
+    """Decorator reporting each call of a function to the sinks
+    Events are dicts with operation, mode, shape, dtype, bytes, seconds and
+    peak_bytes (None unless the memory probe is on)
+
+    Args:
+        operation (str): Operation name
+        describe (callable): Function of (args, kwargs, result) returning
+            (mode, array) where array is the image the call processed
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            
+            probe = _trace_memory and tracemalloc.is_tracing()
+            if probe:
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - before if probe else None
+            
+            mode, image = describe(args, kwargs, result)
+            image = np.asarray(image) if image is not None else None
+            _emit({"operation": operation, "mode": mode, 
+                   "shape": None if image is None else image.shape,
+                   "dtype": None if image is None else str(image.dtype),
+                   "bytes": 0 if image is None else image.nbytes,
+                   "seconds": seconds, "peak_bytes": peak})
+            return result
+        return wrapper
+    return decorator
+
+def _emit(event: dict) -> None:
+    """Sends an event to every sink
+    """
+    for sink in list(_sinks):
+        sink(event)
+
+def describe_conversion(args: tuple, kwargs: dict, result) -> tuple:
+    """Mode and image of a convert_color call
+    """
+    mode = args[1] if len(args) > 1 else kwargs.get("mode")
+    return _COLOR_NAMES.get(mode, mode), args[0] if args else kwargs.get("image")
+
+def describe_read(args: tuple, kwargs: dict, result) -> tuple:
+    """File extension and decoded image of a read_image call
+    """
+    path = args[0] if args else kwargs.get("path")
+    return os.path.splitext(str(path))[1].lower(), result
+
+def describe_write(args: tuple, kwargs: dict, result) -> tuple:
+    """File extension and image of a write_image call
+    """
+    image = args[0] if args else kwargs.get("image")
+    path = args[1] if len(args) > 1 else kwargs.get("path")
+    return os.path.splitext(str(path))[1].lower(), image
+
+def add_sink(sink) -> None:
+    """Starts sending events to a sink (turning instrumentation on)
+
+    Args:
+        sink (callable): Function of an event dict, i.e. a Collector
+    """
+    global _enabled
+    with _sinks_lock:
+        _sinks.append(sink)
+        _enabled = True
+
+def remove_sink(sink) -> None:
+    """Stops sending events to a sink (instrumentation turns off with the last one)
+
+    Args:
+        sink (callable): Sink given to add_sink
+    """
+    global _enabled
+    with _sinks_lock:
+        _sinks.remove(sink)
+        _enabled = bool(_sinks)
+
+def set_memory_probe(enabled: bool) -> None:
+    """Turns the peak allocation probe on or off. It uses tracemalloc 
+    (started here if needed), which slows everything down noticeably. 
+    Peaks are process-wide, so calls running concurrently on other 
+    threads are included
+
+    Args:
+        enabled (bool): Measure peak_bytes for each event
+    """
+    global _trace_memory, _started_tracemalloc
+    if enabled and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    elif not enabled and _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+    _trace_memory = enabled
+
+class Collector:
+    """In-memory sink aggregating events by (operation, mode, shape, dtype)
+    Each entry counts calls, bytes and time, and keeps a histogram of the
+    durations in power of two buckets of microseconds
+    """
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+    
+    def __call__(self, event: dict) -> None:
+        key = (event["operation"], event["mode"], event["shape"], event["dtype"])
+        seconds = event["seconds"]
+        bucket = 2.0 ** max(math.ceil(math.log2(max(seconds * 1e6, 1))), 0) / 1e6
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = {
+                    "operation": key[0], "mode": key[1], "shape": key[2], "dtype": key[3],
+                    "count": 0, "seconds": 0.0, "min_seconds": math.inf, "max_seconds": 0.0, 
+                    "bytes": 0, "peak_bytes": None, "histogram": {}
+                }
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["min_seconds"] = min(entry["min_seconds"], seconds)
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["bytes"] += event["bytes"]
+            if event["peak_bytes"] is not None:
+                entry["peak_bytes"] = max(entry["peak_bytes"] or 0, event["peak_bytes"])
+            entry["histogram"][bucket] = entry["histogram"].get(bucket, 0) + 1
+    
+    def snapshot(self) -> list:
+        """Copies of the entries, slowest total first
+
+        Returns:
+            list: One dict per (operation, mode, shape, dtype), with histogram
+                mapping bucket upper bounds (seconds) to counts
+        """
+        with self.lock:
+            entries = [dict(entry, histogram=dict(sorted(entry["histogram"].items())))
+                       for entry in self.entries.values()]
+        return sorted(entries, key=lambda entry: entry["seconds"], reverse=True)
+    
+    def summary(self) -> str:
+        """Table of the entries (see snapshot)
+
+        Returns:
+            str: One line per entry
+        """
+        lines = [f"{'operation':<14}{'mode':<10}{'shape':<22}{'dtype':<9}"
+                 f"{'calls':>7}{'total ms':>11}{'mean ms':>10}{'MB/s':>10}"]
+        for entry in self.snapshot():
+            rate = entry["bytes"] / 2**20 / entry["seconds"] if entry["seconds"] > 0 else 0
+            lines.append(f"{entry['operation']:<14}{str(entry['mode']):<10}"
+                         f"{str(entry['shape']):<22}{str(entry['dtype']):<9}"
+                         f"{entry['count']:>7}{entry['seconds'] * 1e3:>11.2f}"
+                         f"{entry['seconds'] / entry['count'] * 1e3:>10.3f}{rate:>10.1f}")
+        return "\n".join(lines)
+    
+    def reset(self) -> None:
+        """Drops every entry
+        """
+        with self.lock:
+            self.entries.clear()
+
+@contextlib.contextmanager
+def collect(sink=None, trace_memory: bool = False):
+    """Instruments convert_color, read_image and write_image inside a with
+    block, i.e.
+
+        with collect() as stats:
+            ...
+        print(stats.summary())
+
+    Calls made by other processes (i.e. BatchRunner workers) are not seen
+
+    Args:
+        sink (callable, optional): Event sink, a new Collector if None. Defaults to None.
+        trace_memory (bool, optional): Turn the memory probe on (see 
+            set_memory_probe). Defaults to False.
+
+    Yields:
+        The sink
+    """
+    sink = Collector() if sink is None else sink
+    previous = _trace_memory
+    if trace_memory:
+        set_memory_probe(True)
+    add_sink(sink)
+    try:
+        yield sink
+    finally:
+        remove_sink(sink)
+        if trace_memory:
+            set_memory_probe(previous)
+
+__all__ = [
+    "Collector",
+    "collect",
+    "add_sink",
+    "remove_sink",
+    "set_memory_probe"
+]
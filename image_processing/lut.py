@@ -0,0 +1,236 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# site-packages
+import numpy as np
+
+# native
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+_lut_cache = OrderedDict()
+_lut_cache_nbytes = 0
+_lut_cache_max_nbytes = 256 * 2**20
+_lut_directory = None
+_lut_lock = threading.Lock()
+# one lock per table being built, so concurrent first uses build it once
+_lut_build_locks = {}
+
+# number of red values evaluated at once while building a table
+_BUILD_SLAB = 16
+
+
+def build_lut(func, step: int = 1) -> np.ndarray:
+    """Evaluates a conversion over the whole uint8 RGB cube
+    With step = 1 the table holds every one of the 256^3 colors and lookups
+    are exact. Larger steps sample the cube every 'step' values (step must
+    divide 255) and lookups are trilinearly interpolated
+
+    Args:
+        func (callable): Conversion taking a uint8 ... x 3 image
+        step (int, optional): Sampling step of the cube. Defaults to 1.
+
+    Raises:
+        ValueError: If step does not divide 255
+
+    Returns:
+        np.ndarray: Table of shape (n, n, n, ...) with n = 255 // step + 1
+    """
+    if step < 1 or 255 % step != 0:
+        raise ValueError(f"LUT step must divide 255 (got {step}).")
+    nodes = np.arange(0, 256, step, dtype="uint8")
+    n = len(nodes)
+
+    table = None
+    for start in range(0, n, _BUILD_SLAB):
+        r = nodes[start:start + _BUILD_SLAB]
+        slab = np.empty((len(r), n, n, 3), dtype="uint8")
+        slab[..., 0] = r[:, np.newaxis, np.newaxis]
+        slab[..., 1] = nodes[np.newaxis, :, np.newaxis]
+        slab[..., 2] = nodes[np.newaxis, np.newaxis, :]
+        result = func(slab)
+        if table is None:
+            table = np.empty((n, n, n) + result.shape[3:], dtype=result.dtype)
+        table[start:start + len(r)] = result
+    return table
+
+def apply_lut(image: np.ndarray, table: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """Converts a uint8 RGB image through a table made by build_lut
+
+    Args:
+        image (np.ndarray): Input image (... x 3, uint8)
+        table (np.ndarray): Lookup table
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Converted image
+    """
+    assert image.dtype == np.uint8, "LUTs can only be applied to uint8 images."
+    n = table.shape[0]
+    trailing = table.shape[3:]
+    flat = table.reshape((n ** 3,) + trailing)
+    shape = image.shape[:-1] + trailing
+    if out is not None and (out.shape != shape or out.dtype != table.dtype):
+        raise ValueError(f"Output buffer must be a {shape} {table.dtype} array.")
+
+    if n == 256:
+        index = image[..., 0].astype("uint32") << 16
+        index |= image[..., 1].astype("uint32") << 8
+        index |= image[..., 2]
+        return np.take(flat, index, axis=0, out=out, mode="clip")
+
+    coords = image.astype("float32") * np.float32((n - 1) / 255)
+    base = np.minimum(coords.astype("intp"), n - 2)
+    frac = coords - base
+    base = (base[..., 0] * n + base[..., 1]) * n + base[..., 2]
+    expand = (Ellipsis,) + (np.newaxis,) * len(trailing)
+
+    result = np.zeros(shape, dtype="float32")
+    for dr in (0, 1):
+        wr = frac[..., 0] if dr else 1 - frac[..., 0]
+        for dg in (0, 1):
+            wg = frac[..., 1] if dg else 1 - frac[..., 1]
+            for db in (0, 1):
+                wb = frac[..., 2] if db else 1 - frac[..., 2]
+                corner = np.take(flat, base + ((dr * n + dg) * n + db), axis=0)
+                result += (wr * wg * wb)[expand] * corner
+
+    if np.issubdtype(table.dtype, np.integer):
+        np.rint(result, out=result)
+    if out is None:
+        return result.astype(table.dtype)
+    out[...] = result
+    return out
+
+def get_lut(key, func, step: int = 1) -> np.ndarray:
+    """Returns the table for a conversion, building it on first use
+    Tables are kept in a memory bounded LRU cache and, if a directory was
+    set with set_lut_directory, stored on disk and memory-mapped back in
+    by later processes. Concurrent callers asking for a table that isn't
+    cached yet wait for a single build
+
+    Args:
+        key: Hashable conversion identifier (i.e. a COLOR_ flag)
+        func (callable): Conversion used to build the table
+        step (int, optional): Sampling step of the cube. Defaults to 1.
+
+    Returns:
+        np.ndarray: Lookup table (read-only)
+    """
+    global _lut_cache_nbytes
+    with _lut_lock:
+        if (key, step) in _lut_cache:
+            _lut_cache.move_to_end((key, step))
+            return _lut_cache[(key, step)]
+        build_lock = _lut_build_locks.setdefault((key, step), threading.Lock())
+
+    with build_lock:
+        with _lut_lock:
+            # built by another caller while this one waited
+            if (key, step) in _lut_cache:
+                _lut_cache.move_to_end((key, step))
+                return _lut_cache[(key, step)]
+            directory = _lut_directory
+        
+        path = None if directory is None else os.path.join(directory, f"lut_{key}_{step}.npy")
+        if path is not None and os.path.isfile(path):
+            table = np.load(path, mmap_mode="r")
+        else:
+            table = build_lut(func, step)
+            table.setflags(write=False)
+            if path is not None:
+                _save_atomic(path, table)
+
+        with _lut_lock:
+            if (key, step) not in _lut_cache and table.nbytes <= _lut_cache_max_nbytes:
+                _lut_cache[(key, step)] = table
+                _lut_cache_nbytes += table.nbytes
+                _evict()
+            _lut_build_locks.pop((key, step), None)
+    return table
+
+def _save_atomic(path: str, table: np.ndarray) -> None:
+    """Saves a table next to path and renames it into place, so other
+    processes never map a partially written file
+    """
+    fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".npy.tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            np.save(file, table)
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+def _evict() -> None:
+    """Drops least recently used tables until the cache fits its bound
+    (caller must hold the lock)
+    """
+    global _lut_cache_nbytes
+    while _lut_cache_nbytes > _lut_cache_max_nbytes:
+        _, table = _lut_cache.popitem(last=False)
+        _lut_cache_nbytes -= table.nbytes
+
+def set_lut_cache_size(nbytes: int) -> None:
+    """Sets the memory bound of the LUT cache
+
+    Args:
+        nbytes (int): Maximum total size of the cached tables in bytes
+    """
+    global _lut_cache_max_nbytes
+    with _lut_lock:
+        _lut_cache_max_nbytes = nbytes
+        _evict()
+
+def set_lut_directory(path: str) -> None:
+    """Sets where tables are persisted (None disables persistence)
+    Stale tables are not detected, so clear the directory after upgrading
+
+    Args:
+        path (str): Existing directory
+    """
+    global _lut_directory
+    if path is not None and not os.path.isdir(path):
+        raise FileNotFoundError(f"Can't find LUT directory ({path}).")
+    with _lut_lock:
+        _lut_directory = path
+
+def clear_lut_cache() -> None:
+    """Drops every cached table from memory
+    """
+    global _lut_cache_nbytes
+    with _lut_lock:
+        _lut_cache.clear()
+        _lut_cache_nbytes = 0
+
+__all__ = [
+    "build_lut",
+    "apply_lut",
+    "set_lut_cache_size",
+    "set_lut_directory",
+    "clear_lut_cache"
+]
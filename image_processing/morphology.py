@@ -0,0 +1,306 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# site-packages
+import numpy as np
+
+# local
+import image_processing.constants as cts
+
+
+# windows of at least this many pixels use van Herk/Gil-Werman instead of
+# one pass per pixel of the window
+_VAN_HERK_MIN = 8
+
+
+def _size(size) -> tuple:
+    """(height, width) of a structuring element given as an int or a pair
+    """
+    height, width = (size, size) if np.ndim(size) == 0 else size
+    assert height > 0 and width > 0, "Structuring element size must be positive."
+    return int(height), int(width)
+
+def _half_widths(count: int, length: int) -> np.ndarray:
+    """Half length of each of the count lines making up an elliptical element
+    whose other side is length (i.e. half heights of its columns)
+    """
+    ra, rb = (count - 1) / 2, (length - 1) / 2
+    offsets = np.arange(count) - count // 2
+    if ra == 0:
+        return np.full(count, int(rb))
+    return np.floor(rb * np.sqrt(np.clip(1 - (offsets / ra) ** 2, 0, 1)) + 1e-9).astype(int)
+
+def structuring_element(shape: int, size) -> np.ndarray:
+    """Structuring element as a boolean mask, anchored at its center
+    (row height // 2, column width // 2)
+
+    Args:
+        shape (int): Element shape (MORPH_ prefix)
+        size: Side length, or (height, width) (odd for MORPH_CIRCLE and MORPH_CROSS)
+
+    Raises:
+        RuntimeError: If shape is not a valid option
+
+    Returns:
+        np.ndarray: Mask of shape (height, width)
+    """
+    height, width = _size(size)
+    if shape == cts.MORPH_SQUARE:
+        return np.ones((height, width), dtype=bool)
+    assert height % 2 == 1 and width % 2 == 1, "Circles and crosses need odd sizes."
+    element = np.zeros((height, width), dtype=bool)
+    if shape == cts.MORPH_CROSS:
+        element[height // 2, :] = True
+        element[:, width // 2] = True
+    elif shape == cts.MORPH_CIRCLE:
+        rows = np.abs(np.arange(height) - height // 2)
+        element[:] = rows[:, np.newaxis] <= _half_widths(width, height)
+    else:
+        raise RuntimeError(f"Structuring element {shape} is not available or not a valid option.")
+    return element
+
+def _extreme(dtype, maximum: bool):
+    """Largest (or smallest) value of a type, the identity of min (or max)
+    """
+    if dtype == np.bool_:
+        return maximum
+    if np.issubdtype(dtype, np.floating):
+        return np.inf if maximum else -np.inf
+    info = np.iinfo(dtype)
+    return info.max if maximum else info.min
+
+def _filter_rows(array: np.ndarray, size: int, op, fill) -> np.ndarray:
+    """op (i.e. np.minimum) over windows of size rows (axis -2) anchored at
+    size // 2, with fill (the identity of op) outside the array
+    Large windows use van Herk/Gil-Werman: the rows are cut into blocks of
+    size rows, running results are taken forwards and backwards inside each
+    block and every window is the op of one backward and one forward value,
+    so the cost doesn't depend on size. Every step works on whole rows
+    """
+    if size == 1:
+        return array
+    rows, before = array.shape[-2], size // 2
+    lead, columns = array.shape[:-2], array.shape[-1]
+    if size < _VAN_HERK_MIN:
+        padded = np.full(lead + (rows + size - 1, columns), fill, dtype=array.dtype)
+        padded[..., before:before + rows, :] = array
+        result = padded[..., :rows, :].copy()
+        for j in range(1, size):
+            op(result, padded[..., j:j + rows, :], out=result)
+        return result
+    
+    blocks = -(-(rows + size - 1) // size)
+    forward = np.full(lead + (blocks, size, columns), fill, dtype=array.dtype)
+    forward.reshape(lead + (blocks * size, columns))[..., before:before + rows, :] = array
+    backward = forward.copy()
+    for j in range(1, size):
+        op(forward[..., j - 1, :], forward[..., j, :], out=forward[..., j, :])
+        op(backward[..., size - j, :], backward[..., size - j - 1, :], 
+           out=backward[..., size - j - 1, :])
+    forward = forward.reshape(lead + (blocks * size, columns))
+    backward = backward.reshape(lead + (blocks * size, columns))
+    return op(backward[..., :rows, :], forward[..., size - 1:size - 1 + rows, :])
+
+def _filter_columns(array: np.ndarray, size: int, op, fill) -> np.ndarray:
+    """_filter_rows along axis -1
+    """
+    return np.swapaxes(_filter_rows(np.swapaxes(array, -1, -2), size, op, fill), -1, -2)
+
+def _shifted_rows(array: np.ndarray, shift: int, fill) -> np.ndarray:
+    """array with its rows moved by shift (row i holds row i + shift), fill
+    entering at the border
+    """
+    result = np.full_like(array, fill)
+    rows = array.shape[-2]
+    if shift >= 0:
+        result[..., :rows - shift, :] = array[..., shift:, :]
+    else:
+        result[..., -shift:, :] = array[..., :rows + shift, :]
+    return result
+
+def _morph(image: np.ndarray, size, shape: int, maximum: bool) -> np.ndarray:
+    """Erosion (maximum = False) or dilation of the last two axes
+    For squares and crosses, binary (bool) images are bit packed along the
+    rows for the vertical pass, so it handles 8 pixels per byte
+    """
+    assert len(image.shape) >= 2, "Morphology needs ... x H x W images."
+    height, width = _size(size)
+    if shape not in (cts.MORPH_SQUARE, cts.MORPH_CIRCLE, cts.MORPH_CROSS):
+        raise RuntimeError(f"Structuring element {shape} is not available or not a valid option.")
+    if shape != cts.MORPH_SQUARE:
+        assert height % 2 == 1 and width % 2 == 1, "Circles and crosses need odd sizes."
+    op = np.maximum if maximum else np.minimum
+    fill = _extreme(image.dtype, not maximum)
+    
+    binary = image.dtype == np.bool_
+    columns = image.shape[-1]
+    if binary:
+        pack = lambda array: np.packbits(array, axis=-1)
+        unpack = lambda array: np.unpackbits(array, axis=-1, count=columns).view(bool)
+        vertical_op = np.bitwise_or if maximum else np.bitwise_and
+        vertical_fill = 0 if maximum else 0xFF
+    else:
+        pack = unpack = lambda array: array
+        vertical_op, vertical_fill = op, fill
+    
+    if shape == cts.MORPH_SQUARE:
+        result = _filter_columns(image, width, op, fill)
+        return unpack(_filter_rows(pack(result), height, vertical_op, vertical_fill))
+    if shape == cts.MORPH_CROSS:
+        across = _filter_columns(image, width, op, fill)
+        down = unpack(_filter_rows(pack(image), height, vertical_op, vertical_fill))
+        return op(across, down)
+    
+    # ellipse: union of centered vertical lines, one per column of the
+    # element, each computed once per distinct length and combined shifted
+    heights = _half_widths(width, height)
+    center = width // 2
+    result = _filter_rows(image, 2 * heights[center] + 1, op, fill)
+    result = result.copy() if result is image else result
+    for half in np.unique(heights):
+        offsets = [column - center for column in np.flatnonzero(heights == half) 
+                   if 0 < abs(column - center) < columns]
+        if not offsets:
+            continue
+        line = _filter_rows(image, 2 * half + 1, op, fill)
+        for dx in offsets:
+            if dx > 0:
+                op(result[..., :-dx], line[..., dx:], out=result[..., :-dx])
+            else:
+                op(result[..., -dx:], line[..., :dx], out=result[..., -dx:])
+    return result
+
+def _finish(image: np.ndarray, result: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Returns result as a new contiguous array, or copies it to out
+    """
+    if out is None:
+        return result.copy() if result is image else np.ascontiguousarray(result)
+    np.copyto(out, result)
+    return out
+
+def erode(image: np.ndarray, size, shape: int = cts.MORPH_SQUARE, 
+          iterations: int = 1, out: np.ndarray = None) -> np.ndarray:
+    """Erosion: minimum over the structuring element around each pixel
+    Works on the last two axes, so batches (N x H x W) and planar color 
+    images (C x H x W) are processed plane by plane. Squares and crosses 
+    are separated into lines, circles into one line per row, and lines of 
+    _VAN_HERK_MIN pixels or more cost the same whatever their length. 
+    Pixels outside the image are ignored
+
+    Args:
+        image (np.ndarray): Input image (... x H x W, bool for binary images)
+        size: Side length of the element, or (height, width)
+        shape (int, optional): Element shape (MORPH_ prefix). Defaults to MORPH_SQUARE.
+        iterations (int, optional): Times to apply the erosion. Defaults to 1.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+
+    Returns:
+        np.ndarray: Eroded image
+    """
+    result = image
+    for _ in range(iterations):
+        result = _morph(result, size, shape, maximum=False)
+    return _finish(image, result, out)
+
+def dilate(image: np.ndarray, size, shape: int = cts.MORPH_SQUARE, 
+           iterations: int = 1, out: np.ndarray = None) -> np.ndarray:
+    """Dilation: maximum over the structuring element around each pixel
+    (see erode)
+
+    Args:
+        image (np.ndarray): Input image (... x H x W, bool for binary images)
+        size: Side length of the element, or (height, width)
+        shape (int, optional): Element shape (MORPH_ prefix). Defaults to MORPH_SQUARE.
+        iterations (int, optional): Times to apply the dilation. Defaults to 1.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+
+    Returns:
+        np.ndarray: Dilated image
+    """
+    result = image
+    for _ in range(iterations):
+        result = _morph(result, size, shape, maximum=True)
+    return _finish(image, result, out)
+
+def opening(image: np.ndarray, size, shape: int = cts.MORPH_SQUARE, 
+            out: np.ndarray = None) -> np.ndarray:
+    """Opening: erosion followed by dilation, removes bright details 
+    smaller than the element (see erode)
+
+    Args:
+        image (np.ndarray): Input image (... x H x W, bool for binary images)
+        size: Side length of the element, or (height, width)
+        shape (int, optional): Element shape (MORPH_ prefix). Defaults to MORPH_SQUARE.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+
+    Returns:
+        np.ndarray: Opened image
+    """
+    return dilate(erode(image, size, shape), size, shape, out=out)
+
+def closing(image: np.ndarray, size, shape: int = cts.MORPH_SQUARE, 
+            out: np.ndarray = None) -> np.ndarray:
+    """Closing: dilation followed by erosion, fills dark details smaller 
+    than the element (see erode)
+
+    Args:
+        image (np.ndarray): Input image (... x H x W, bool for binary images)
+        size: Side length of the element, or (height, width)
+        shape (int, optional): Element shape (MORPH_ prefix). Defaults to MORPH_SQUARE.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+
+    Returns:
+        np.ndarray: Closed image
+    """
+    return erode(dilate(image, size, shape), size, shape, out=out)
+
+def morphological_gradient(image: np.ndarray, size, shape: int = cts.MORPH_SQUARE, 
+                           out: np.ndarray = None) -> np.ndarray:
+    """Morphological gradient: dilation minus erosion, which outlines 
+    edges (see erode). For binary images, pixels of the dilation that are 
+    not in the erosion
+
+    Args:
+        image (np.ndarray): Input image (... x H x W, bool for binary images)
+        size: Side length of the element, or (height, width)
+        shape (int, optional): Element shape (MORPH_ prefix). Defaults to MORPH_SQUARE.
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Returns:
+        np.ndarray: Gradient image
+    """
+    dilated = _morph(image, size, shape, maximum=True)
+    eroded = _morph(image, size, shape, maximum=False)
+    if image.dtype == np.bool_:
+        return _finish(image, np.logical_xor(dilated, eroded), out)
+    return _finish(image, np.subtract(dilated, eroded), out)
+
+__all__ = [
+    "structuring_element",
+    "erode",
+    "dilate",
+    "opening",
+    "closing",
+    "morphological_gradient"
+]
@@ -0,0 +1,219 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# site-packages
+import numpy as np
+
+# local
+import image_processing.color_conversion as ccv
+import image_processing.constants as cts
+from image_processing.utils import convert_dtype, working_dtype
+
+
+# conversions undone by the one that follows them (for in-gamut input)
+inverse_pairs = {
+    (cts.COLOR_RGB2HSV, cts.COLOR_HSV2RGB),
+    (cts.COLOR_RGB2HLS, cts.COLOR_HLS2RGB),
+    (cts.COLOR_RGB2Lab, cts.COLOR_Lab2RGB),
+    (cts.COLOR_RGB2Luv, cts.COLOR_Luv2RGB),
+    (cts.COLOR_RGB2RGBA, cts.COLOR_RGBA2RGB)
+}
+
+# channel reorders as permutations of the channel axis
+reorder_modes = {
+    cts.COLOR_RGB2BGR: (2, 1, 0),
+    cts.COLOR_BGR2RGB: (2, 1, 0)
+}
+
+# uint8 encoding (scale, offset per channel) of the float results of 
+# conversions that don't give values in [0, 1], as convert_color stores them
+uint8_encodings = {
+    cts.COLOR_RGB2HSV: ((0.5, 255, 255), (0, 0, 0)),
+    cts.COLOR_RGB2HLS: ((0.5, 255, 255), (0, 0, 0)),
+    cts.COLOR_RGB2Lab: ((255 / 100, 1, 1), (0, 128, 128)),
+    cts.COLOR_RGB2Luv: ((255 / 100, 255 / 354, 255 / 262), (0, 134 * 255 / 354, 140 * 255 / 262))
+}
+
+
+def _as_step(step) -> tuple:
+    """Turns a COLOR_ flag or a callable into a plan step
+    ("perm", permutation), ("linear", (matrix, offset, clip)),
+    ("mode", flag) or ("op", callable)
+    """
+    if callable(step):
+        return ("op", step)
+    if step in reorder_modes:
+        return ("perm", reorder_modes[step])
+    if step in ccv.linear_transforms:
+        matrix, offset, clip = ccv.linear_transforms[step]
+        offset = np.broadcast_to(offset, matrix.shape[:-1]).astype("float64")
+        return ("linear", (matrix, offset, clip))
+    if step in ccv.conversion_methods:
+        return ("mode", step)
+    raise RuntimeError(f"Conversion {step} is not available or not a valid option.")
+
+def _fuse(first: tuple, second: tuple):
+    """Combines two adjacent plan steps into one, or returns None
+    An empty list means both steps cancel out
+    """
+    kind = (first[0], second[0])
+    if kind == ("mode", "mode") and (first[1], second[1]) in inverse_pairs:
+        return []
+    if kind == ("perm", "perm"):
+        perm = tuple(first[1][i] for i in second[1])
+        return [] if perm == tuple(range(len(perm))) else [("perm", perm)]
+    if kind == ("perm", "linear"):
+        matrix, offset, clip = second[1]
+        folded = np.zeros_like(matrix)
+        folded[..., list(first[1])] = matrix
+        return [("linear", (folded, offset, clip))]
+    if kind == ("linear", "perm") and first[1][0].ndim == 2:
+        matrix, offset, clip = first[1]
+        perm = list(second[1])
+        return [("linear", (matrix[perm], offset[perm], clip))]
+    if kind == ("linear", "linear") and first[1][0].ndim == 2:
+        (m1, o1, _), (m2, o2, clip) = first[1], second[1]
+        matrix, offset = m2 @ m1, m2 @ o1 + o2
+        identity = matrix.ndim == 2 and np.allclose(matrix, np.eye(3), atol=1e-4)
+        if identity and np.allclose(offset, 0, atol=1e-4):
+            return []
+        return [("linear", (matrix, offset, clip))]
+    return None
+
+def compile_steps(steps) -> list:
+    """Builds the execution plan of a sequence of steps, collapsing channel
+    reorders, adjacent linear transforms (into one matrix) and inverse
+    pairs (into nothing) until no more steps can be combined
+
+    Args:
+        steps (iterable): COLOR_ flags and callables
+
+    Returns:
+        list: Plan steps
+    """
+    plan = []
+    for step in map(_as_step, steps):
+        plan.append(step)
+        while len(plan) > 1:
+            fused = _fuse(plan[-2], plan[-1])
+            if fused is None:
+                break
+            plan[-2:] = fused
+    return plan
+
+class Pipeline:
+    """Sequence of color conversions and elementwise operations, compiled
+    once (see compile_steps) and run in a single float working buffer
+    Integer input is promoted to float once, every step runs on float data
+    (so operations see the float conventions, i.e. hue in [0, 360]) and the
+    result is converted back at the end. Fused steps skip the rounding and
+    clipping the individual conversions would apply in between
+
+    uint8 results of pipelines ending in a space listed in uint8_encodings
+    (HSV, HLS, Lab, Luv, followed by any operations) are encoded as 
+    convert_color does. Other results are expected in [0, 1]
+
+    Args:
+        steps (iterable): COLOR_ flags and callables taking and returning
+            an image (they may modify it in place)
+        precision (int, optional): Working precision (PRECISION_ prefix). Defaults to None.
+        dtype (optional): Result data type, the input's if None. Defaults to None.
+    """
+    def __init__(self, steps, precision: int = None, dtype=None):
+        self.steps = list(steps)
+        self.plan = compile_steps(self.steps)
+        self.precision = precision
+        self.dtype = dtype
+        
+        # encoding of the space the plan ends in (operations keep it)
+        self.encoding = None
+        for kind, step in self.plan:
+            if kind == "mode":
+                self.encoding = uint8_encodings.get(step)
+            elif kind == "perm" and self.encoding is not None:
+                self.encoding = tuple(tuple(values[i] for i in step) for values in self.encoding)
+            elif kind == "linear":
+                self.encoding = None
+
+    def __call__(self, image: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """Runs the pipeline
+
+        Args:
+            image (np.ndarray): Input image (... x C)
+            out (np.ndarray, optional): Output buffer. Defaults to None.
+
+        Raises:
+            ValueError: If the result is in a space of uint8_encodings and
+                has an integer dtype other than uint8
+
+        Returns:
+            np.ndarray: Result
+        """
+        dtype = working_dtype(image.dtype, self.precision)
+        if np.issubdtype(image.dtype, np.floating):
+            buffer = image.astype(dtype)
+        else:
+            buffer = convert_dtype(image, dtype)
+
+        for kind, step in self.plan:
+            if kind == "perm":
+                buffer = buffer[..., list(step)]
+            elif kind == "linear":
+                buffer = ccv._apply_linear(buffer, step, precision=self.precision)
+            elif kind == "op":
+                buffer = step(buffer)
+            else:
+                inplace = step not in (cts.COLOR_GRAY2RGB, cts.COLOR_RGB2RGBA)
+                buffer = ccv.convert_color(buffer, step, inplace=inplace, precision=self.precision)
+
+        result_dtype = image.dtype if self.dtype is None else np.dtype(self.dtype)
+        if self.encoding is not None and np.issubdtype(result_dtype, np.integer):
+            result = self._encode(buffer, result_dtype)
+        else:
+            result = convert_dtype(buffer, result_dtype)
+        if out is None:
+            return result
+        np.copyto(out, result)
+        return out
+
+    def _encode(self, buffer: np.ndarray, dtype) -> np.ndarray:
+        """Stores a float result in the final space's uint8 encoding
+        """
+        if dtype != np.uint8:
+            raise ValueError(f"Pipeline results in this color space can't be stored as {dtype}.")
+        scale, offset = self.encoding
+        buffer = buffer * np.asarray(scale, dtype=buffer.dtype)
+        buffer += np.asarray(offset, dtype=buffer.dtype)
+        np.rint(buffer, out=buffer)
+        np.clip(buffer, 0, 255, out=buffer)
+        return buffer.astype("uint8")
+
+    def __repr__(self) -> str:
+        names = [step.__name__ if kind == "op" and hasattr(step, "__name__") else kind
+                 for kind, step in self.plan]
+        return f"Pipeline({len(self.steps)} steps -> {names})"
+
+__all__ = [
+    "Pipeline"
+]
@@ -0,0 +1,239 @@
+"""
+MIT License
+
+Copyright (c) 2021 booleangabs
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+# site-packages
+import numpy as np
+
+# local
+import image_processing.constants as cts
+from image_processing.utils import _run_regions
+
+
+# number of histogram bins used for float images
+_FLOAT_LEVELS = 256
+
+
+def _histogram(image: np.ndarray, per_item: bool) -> tuple:
+    """Histogram of an image (one row per item if per_item) in one pass
+    Returns the histograms and the value of each bin
+    """
+    if np.issubdtype(image.dtype, np.floating):
+        levels = _FLOAT_LEVELS
+        scale = levels - 1
+        values = np.arange(levels) / scale
+    else:
+        assert image.dtype in (np.uint8, np.uint16), "Otsu needs uint8, uint16 or float images."
+        levels = np.iinfo(image.dtype).max + 1
+        scale = None
+        values = np.arange(levels)
+    
+    items = image.reshape(len(image), -1) if per_item else image.reshape(1, -1)
+    histograms = np.empty((len(items), levels), dtype="int64")
+    for i, item in enumerate(items):
+        if scale is not None:
+            item = np.rint(np.clip(item, 0, 1) * scale).astype("intp")
+        elif levels == 256 and item.size % 2 == 0:
+            # counting pairs of pixels halves the work of bincount
+            pairs = np.bincount(np.ascontiguousarray(item).view("uint16"), minlength=levels ** 2)
+            pairs = pairs.reshape(levels, levels)
+            histograms[i] = pairs.sum(axis=0) + pairs.sum(axis=1)
+            continue
+        histograms[i] = np.bincount(item, minlength=levels)
+    return histograms, values
+
+def otsu_threshold(image: np.ndarray, per_item: bool = False):
+    """Threshold that maximizes the variance between the two classes of 
+    pixels (Otsu's method), found in O(levels) from a single histogram pass
+    Pixels above the threshold form the bright class. Float images (in 
+    [0, 1]) are quantized to 256 levels
+
+    Args:
+        image (np.ndarray): Input image (uint8, uint16 or float)
+        per_item (bool, optional): One threshold per item of a batch (first axis). Defaults to False.
+
+    Returns:
+        Threshold (an array of shape N x 1 x ... x 1 if per_item)
+    """
+    histograms, values = _histogram(image, per_item)
+    levels = histograms.shape[-1]
+    weight = np.cumsum(histograms, axis=-1, dtype="float64")
+    mean = np.cumsum(histograms * np.arange(levels), axis=-1, dtype="float64")
+    total, total_mean = weight[:, -1:], mean[:, -1:]
+    
+    # between class variance (times total^2) for a split after each level
+    between = (total_mean * weight - total * mean) ** 2
+    denominator = weight * (total - weight)
+    np.divide(between, denominator, out=between, where=denominator > 0)
+    between[denominator <= 0] = 0
+    level = np.argmax(between, axis=-1)
+    
+    if np.issubdtype(image.dtype, np.floating):
+        thresholds = ((level + 0.5) / (levels - 1)).astype(image.dtype)
+    else:
+        thresholds = values[level].astype(image.dtype)
+    if per_item:
+        return thresholds.reshape((len(image),) + (1,) * (len(image.shape) - 1))
+    return thresholds[0]
+
+def _apply_threshold(image: np.ndarray, thresh, mode: int, maxval, 
+                     out: np.ndarray, threads: int = None) -> np.ndarray:
+    """Applies a threshold (a scalar, or an array broadcasting against the
+    image) region by region
+    """
+    thresh = np.asarray(thresh)
+    per_row = thresh.ndim == image.ndim and thresh.shape[0] > 1
+    
+    def func(index):
+        source, target = image[index], out[index]
+        limit = thresh[index[:1]] if per_row else thresh
+        mask = np.greater(source, limit)
+        if mode == cts.THRESH_BINARY:
+            np.multiply(mask, maxval, out=target, casting="unsafe")
+        elif mode == cts.THRESH_INVERSE:
+            np.logical_not(mask, out=mask)
+            np.multiply(mask, maxval, out=target, casting="unsafe")
+        elif mode == cts.THRESH_TOZERO:
+            np.multiply(source, mask, out=target)
+        else:
+            np.copyto(target, source)
+            np.copyto(target, maxval, where=mask, casting="unsafe")
+    _run_regions(image.shape, func, None, threads, image.size)
+    return out
+
+def threshold(image: np.ndarray, thresh=None, mode: int = cts.THRESH_BINARY, 
+              maxval=None, per_item: bool = False, out: np.ndarray = None, 
+              threads: int = None) -> np.ndarray:
+    """Thresholding. Options for mode are
+            THRESH_BINARY: maxval above thresh, 0 elsewhere
+            THRESH_INVERSE: 0 above thresh, maxval elsewhere
+            THRESH_TOZERO: pixel above thresh, 0 elsewhere
+            THRESH_TOMAX: maxval above thresh, pixel elsewhere
+    
+    THRESH_OTSU can be combined with any of them (i.e. 
+    THRESH_BINARY | THRESH_OTSU, or THRESH_OTSU alone for binary) to 
+    compute thresh with otsu_threshold instead of passing it.
+
+    Args:
+        image (np.ndarray): Input image (any shape)
+        thresh (optional): Threshold, a scalar or an array broadcasting 
+            against the image (i.e. N x 1 x 1 for a batch). Defaults to None.
+        mode (int, optional): Thresholding flag (THRESH_ prefix). Defaults to THRESH_BINARY.
+        maxval (optional): Value of the pixels set to max, the maximum of 
+            the integer type or 1.0 for floats if None. Defaults to None.
+        per_item (bool, optional): With THRESH_OTSU, one threshold per item 
+            of a batch (first axis). Defaults to False.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+        threads (int, optional): Threads to use (see set_num_threads). Defaults to None.
+
+    Raises:
+        RuntimeError: If mode is not a valid option
+        ValueError: If no threshold is given without THRESH_OTSU, or out has the wrong shape
+
+    Returns:
+        np.ndarray: Thresholded image (same dtype as image, or out)
+    """
+    otsu = bool(mode & cts.THRESH_OTSU)
+    mode &= ~cts.THRESH_OTSU
+    if mode not in (cts.THRESH_BINARY, cts.THRESH_INVERSE, cts.THRESH_TOZERO, cts.THRESH_TOMAX):
+        raise RuntimeError(f"Thresholding {mode} is not available or not a valid option.")
+    if otsu:
+        thresh = otsu_threshold(image, per_item)
+    elif thresh is None:
+        raise ValueError("A threshold is required unless THRESH_OTSU is set.")
+    if maxval is None:
+        maxval = 1.0 if np.issubdtype(image.dtype, np.floating) else np.iinfo(image.dtype).max
+    if out is None:
+        out = np.empty_like(image)
+    elif out.shape != image.shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {image.shape}.")
+    return _apply_threshold(image, thresh, mode, maxval, out, threads)
+
+def _window_sums(running: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Sums over windows of radius pixels (cropped at the borders) along an
+    axis, from running sums along it that start with a zero
+    """
+    size = running.shape[axis] - 1
+    radius = min(radius, size)
+    at = lambda start, stop: (Ellipsis, slice(start, stop)) + (slice(None),) * (-1 - axis)
+    shape = list(running.shape)
+    shape[axis] = size
+    
+    sums = np.empty(shape, dtype=running.dtype)
+    sums[at(0, size - radius)] = running[at(radius + 1, size + 1)]
+    sums[at(size - radius, size)] = running[at(size, size + 1)]
+    sums[at(radius, size)] -= running[at(0, size - radius)]
+    return sums
+
+def adaptive_threshold(image: np.ndarray, block_size: int, offset: float = 0, 
+                       mode: int = cts.THRESH_BINARY, maxval=None, 
+                       out: np.ndarray = None) -> np.ndarray:
+    """Thresholds each pixel against the mean of the block_size x block_size
+    window around it minus offset, so uneven lighting (i.e. on scanned 
+    pages) doesn't matter. Window sums come from an integral image, so the 
+    cost doesn't depend on block_size. Windows are cropped at the borders
+
+    Args:
+        image (np.ndarray): Input image (... x H x W, a batch of gray images)
+        block_size (int): Window size (odd)
+        offset (float, optional): Subtracted from the local mean. Defaults to 0.
+        mode (int, optional): Thresholding flag (THRESH_ prefix, not 
+            THRESH_OTSU). Defaults to THRESH_BINARY.
+        maxval (optional): Value of the pixels set to max (see threshold). Defaults to None.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+
+    Raises:
+        RuntimeError: If mode includes THRESH_OTSU
+
+    Returns:
+        np.ndarray: Thresholded image
+    """
+    if mode & cts.THRESH_OTSU:
+        raise RuntimeError("THRESH_OTSU can't be combined with adaptive thresholds.")
+    assert block_size % 2 == 1 and block_size > 1, "Block size must be odd and greater than 1."
+    assert len(image.shape) >= 2, "Adaptive thresholds need ... x H x W images."
+    radius = block_size // 2
+    height, width = image.shape[-2:]
+    
+    # running sums along the rows (an integral image, one axis at a time),
+    # row by row which is several times faster than cumsum along axis -2
+    running = np.zeros(image.shape[:-2] + (height + 1, width), dtype="float64")
+    for row in range(height):
+        np.add(running[..., row, :], image[..., row, :], out=running[..., row + 1, :])
+    local = _window_sums(running, radius, -2)
+    running = np.zeros(image.shape[:-2] + (height, width + 1), dtype="float64")
+    np.cumsum(local, axis=-1, out=running[..., 1:])
+    local = _window_sums(running, radius, -1)
+    
+    # divide by the number of pixels in each (cropped) window
+    rows, cols = np.arange(height), np.arange(width)
+    local /= (np.minimum(rows + radius + 1, height) - np.maximum(rows - radius, 0))[:, np.newaxis]
+    local /= np.minimum(cols + radius + 1, width) - np.maximum(cols - radius, 0)
+    local -= offset
+    return threshold(image, local, mode, maxval, out=out, threads=1)
+
+__all__ = [
+    "otsu_threshold",
+    "threshold",
+    "adaptive_threshold"
+]
@@ -24,19 +24,38 @@ SOFTWARE.
 
 # site-packages
 import numpy as np
-import matplotlib.pyplot as plt
 
 # local
 import image_processing.constants as cts
 
+# native
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+_precision = cts.PRECISION_AUTO
+_num_threads = 1
+_executor = None
+_executor_threads = 0
+_executor_lock = threading.Lock()
+
+# images smaller than this (in elements) are never split across threads
+PARALLEL_MIN_SIZE = 1 << 18
+
+# pixels per row when minmax reduces per channel
+_STATS_WIDTH = 256
+
 
 def show(image: np.ndarray) -> None:
     """Show image
-    Wraps matplotlib's imshow and show
+    Wraps matplotlib's imshow and show (pyplot is imported on first use)
 
     Args:
         image (np.ndarray): Input image
     """
+    import matplotlib.pyplot as plt
+    
     plt.axis("off")
     
     if len(image.shape) > 2:
@@ -45,78 +64,497 @@ def show(image: np.ndarray) -> None:
         plt.imshow(image, cmap="gray")
     plt.show()
 
-def normalize(image: np.ndarray) -> np.ndarray:
+def set_precision(precision: int) -> None:
+    """Sets the default working precision of float intermediates. Options are
+            PRECISION_AUTO: float images keep their own precision, integer
+                images are processed in float64
+            PRECISION_FLOAT32, PRECISION_FLOAT64: always use that precision
+            PRECISION_FIXED: integer fixed-point kernels where available
+                (integer images), PRECISION_AUTO otherwise
+    Float results always keep the dtype of a float input
+
+    Args:
+        precision (int): Precision flag (PRECISION_ prefix)
+    """
+    global _precision
+    if precision not in (cts.PRECISION_AUTO, cts.PRECISION_FLOAT32, 
+                         cts.PRECISION_FLOAT64, cts.PRECISION_FIXED):
+        raise RuntimeError(f"Precision {precision} is not a valid option.")
+    _precision = precision
+
+def get_precision() -> int:
+    """Returns the default working precision (see set_precision)
+
+    Returns:
+        int: Precision flag (PRECISION_ prefix)
+    """
+    return _precision
+
+def working_dtype(dtype, precision: int = None) -> np.dtype:
+    """Float type used for intermediates of an image of the given dtype
+
+    Args:
+        dtype: Image data type
+        precision (int, optional): Precision flag, the default if None. Defaults to None.
+
+    Returns:
+        np.dtype: float32 or float64
+    """
+    precision = _precision if precision is None else precision
+    if precision == cts.PRECISION_FLOAT32:
+        return np.dtype("float32")
+    if precision == cts.PRECISION_FLOAT64:
+        return np.dtype("float64")
+    if np.issubdtype(dtype, np.floating):
+        return np.dtype(dtype)
+    return np.dtype("float64")
+
+def convert_dtype(image: np.ndarray, dtype) -> np.ndarray:
+    """Converts between pixel types, keeping integers in [0, max of the type]
+    and floats in [0, 1]. Returns image itself if it already has that type
+
+    Args:
+        image (np.ndarray): Input image
+        dtype: Target data type
+
+    Returns:
+        np.ndarray: Converted image
+    """
+    dtype = np.dtype(dtype)
+    if image.dtype == dtype:
+        return image
+    source_float = np.issubdtype(image.dtype, np.floating)
+    target_float = np.issubdtype(dtype, np.floating)
+    if source_float and target_float:
+        return image.astype(dtype)
+    if target_float:
+        return np.divide(image, np.iinfo(image.dtype).max, dtype=dtype)
+    
+    maximum = np.iinfo(dtype).max
+    if source_float:
+        result = np.multiply(image, maximum, dtype=working_dtype(image.dtype))
+    else:
+        result = np.multiply(image, maximum / np.iinfo(image.dtype).max)
+    np.rint(result, out=result)
+    np.clip(result, 0, maximum, out=result)
+    return result.astype(dtype)
+
+def minmax(image: np.ndarray, per_channel: bool = False, 
+           per_item: bool = False) -> tuple:
+    """Minimum and maximum of an image
+    Results keep the image's number of dimensions, so they broadcast 
+    against it. Per channel statistics are reduced over rows of many 
+    pixels at once, which vectorizes far better than reducing along the 
+    short channel axis
+
+    Args:
+        image (np.ndarray): Input image (may be a np.memmap)
+        per_channel (bool, optional): One value per channel (last axis). Defaults to False.
+        per_item (bool, optional): One value per item of a batch (first axis). Defaults to False.
+
+    Returns:
+        tuple: (minimum, maximum)
+    """
+    if not per_channel:
+        axes = tuple(range(1 if per_item else 0, len(image.shape)))
+        return image.min(axis=axes, keepdims=True), image.max(axis=axes, keepdims=True)
+    
+    items = image.shape[0] if per_item else 1
+    channels = image.shape[-1]
+    view = np.reshape(image, (items, -1, channels))
+    pixels = view.shape[1]
+    width = min(_STATS_WIDTH, pixels)
+    head = pixels - pixels % width
+    wide = view[:, :head].reshape(items, head // width, width * channels)
+    low = wide.min(axis=1).reshape(items, width, channels).min(axis=1)
+    high = wide.max(axis=1).reshape(items, width, channels).max(axis=1)
+    if head < pixels:
+        np.minimum(low, view[:, head:].min(axis=1), out=low)
+        np.maximum(high, view[:, head:].max(axis=1), out=high)
+    
+    shape = [1] * len(image.shape)
+    if per_item:
+        shape[0] = items
+    shape[-1] = channels
+    return low.reshape(shape), high.reshape(shape)
+
+def _range_output(image: np.ndarray, out: np.ndarray, dtype) -> np.ndarray:
+    """Checks (or allocates) the output buffer of normalize and map_to_range
+    """
+    if out is None:
+        return np.empty(image.shape, dtype=dtype)
+    if out.shape != image.shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {image.shape}.")
+    if not np.issubdtype(out.dtype, np.floating):
+        raise TypeError(f"Output buffer must be a float array (got {out.dtype}).")
+    return out
+
+def _rescale(image: np.ndarray, scale: float, offset: float, tile_shape: tuple, 
+             precision: int, threads: int, per_channel: bool, per_item: bool, 
+             out: np.ndarray) -> np.ndarray:
+    """(image - min) / (max - min), then * scale + offset if scale is not None,
+    computed in the output buffer. Constant images (max = min) give 0 (offset)
+    """
+    dtype = working_dtype(image.dtype, precision)
+    out = _range_output(image, out, dtype)
+    dtype = out.dtype
+    low, high = minmax(image, per_channel, per_item)
+    low = low.astype(dtype)
+    span = high.astype(dtype) - low
+    span[span == 0] = 1
+    if scale is not None:
+        scale, offset = dtype.type(scale), dtype.type(offset)
+    
+    def func(index):
+        stats = index[:1] if per_item else ()
+        region = out[index]
+        np.subtract(image[index], low[stats], out=region, dtype=dtype)
+        np.divide(region, span[stats], out=region)
+        if scale is not None:
+            np.multiply(region, scale, out=region)
+            np.add(region, offset, out=region)
+    _run_regions(image.shape, func, tile_shape, threads, image.size)
+    return out
+
+def normalize(image: np.ndarray, tile_shape: tuple = None, 
+              precision: int = None, threads: int = None, per_channel: bool = False,
+              per_item: bool = False, out: np.ndarray = None) -> np.ndarray:
     """Map pixel values to [0, 1]
+    Constant images (or channels/items) map to 0
 
     Args:
         image (np.ndarray): Input image
+        tile_shape (tuple, optional): Process in tiles (see process_tiled). Defaults to None.
+        precision (int, optional): Working precision (see set_precision). Defaults to None.
+        threads (int, optional): Threads to use (see set_num_threads). Defaults to None.
+        per_channel (bool, optional): Normalize each channel on its own. Defaults to False.
+        per_item (bool, optional): Normalize each item of a batch (first axis) 
+            on its own. Defaults to False.
+        out (np.ndarray, optional): Output buffer (float, may be image). Defaults to None.
 
     Returns:
-        np.ndarray: Normalized image
+        np.ndarray: Normalized image (float)
     """
-    return (image - image.min()) / (image.max() - image.min())
+    return _rescale(image, None, None, tile_shape, precision, threads, 
+                    per_channel, per_item, out)
 
-def map_to_range(image: np.ndarray, low: float, high: float) -> np.ndarray:
+def map_to_range(image: np.ndarray, low: float, high: float, 
+                 tile_shape: tuple = None, precision: int = None,
+                 threads: int = None, per_channel: bool = False, 
+                 per_item: bool = False, out: np.ndarray = None) -> np.ndarray:
     """Maps pixel values to [low, high]
+    Constant images (or channels/items) map to low
 
     Args:
         image (np.ndarray): Input image
         low (float): Lower bound for pixel value (and new min)
         high (float): Upperbound for pixel value (and new max)
+        tile_shape (tuple, optional): Process in tiles (see process_tiled). Defaults to None.
+        precision (int, optional): Working precision (see set_precision). Defaults to None.
+        threads (int, optional): Threads to use (see set_num_threads). Defaults to None.
+        per_channel (bool, optional): Map each channel on its own. Defaults to False.
+        per_item (bool, optional): Map each item of a batch (first axis) 
+            on its own. Defaults to False.
+        out (np.ndarray, optional): Output buffer (float, may be image). Defaults to None.
 
     Returns:
-        np.ndarray: Image with remapped values
+        np.ndarray: Image with remapped values (float)
     """
-    norm = normalize(image)
-    return norm * (high - low) + low
+    return _rescale(image, high - low, low, tile_shape, precision, threads, 
+                    per_channel, per_item, out)
 
-def clip_to_range(image: np.ndarray, low: float, high: float) -> np.ndarray:
+def clip_to_range(image: np.ndarray, low: float, high: float, 
+                  threads: int = None, out: np.ndarray = None) -> np.ndarray:
     """Clips pixel values to [low, high]
+    Integer images are clipped to the integers inside the bounds
 
     Args:
         image (np.ndarray): Input image
         low (float): Lower bound for pixel value
         high (float): Upper bound for pixel value
+        threads (int, optional): Threads to use (see set_num_threads). Defaults to None.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
 
     Returns:
         np.ndarray: Image with clipped values
     """
-    result = image.copy()
-    result[image < low] = low
-    result[image > high] = high
-    return result
+    if np.issubdtype(image.dtype, np.integer):
+        info = np.iinfo(image.dtype)
+        low = int(min(max(np.ceil(low), info.min), info.max))
+        high = int(min(max(np.floor(high), info.min), info.max))
+    if out is None:
+        out = np.empty_like(image)
+    func = lambda index: np.clip(image[index], low, high, out=out[index])
+    _run_regions(image.shape, func, None, threads, image.size)
+    return out
 
-def split(image: np.ndarray) -> list:
-    """Splits image into a list of its channels
+def _channel_axis(layout: int) -> int:
+    """Axis holding the channels in a layout (LAYOUT_ prefix)
+    """
+    if layout == cts.LAYOUT_INTERLEAVED:
+        return -1
+    if layout == cts.LAYOUT_PLANAR:
+        return -3
+    raise RuntimeError(f"Layout {layout} is not a valid option.")
+
+def split(image: np.ndarray, layout: int = cts.LAYOUT_INTERLEAVED) -> list:
+    """Splits image into a list of its channels (views, no copies)
+    Batches of images (N x H x W x C) are split into C arrays of shape 
+    N x H x W. Planes of a contiguous planar image are contiguous too
 
     Args:
-        image (np.ndarray): Input image (H x W x C)
+        image (np.ndarray): Input image (... x H x W x C, or ... x C x H x W if planar)
+        layout (int, optional): Channel layout (LAYOUT_ prefix). Defaults to LAYOUT_INTERLEAVED.
 
     Returns:
         list: List containing the C channels
     """
     assert len(image.shape) > 2, "Cannot split single channel images."
-    result = []
-    for i in range(image.shape[2]):
-        result.append(image[..., i])
-    return result
+    if _channel_axis(layout) == -1:
+        return [image[..., i] for i in range(image.shape[-1])]
+    return [image[..., i, :, :] for i in range(image.shape[-3])]
 
-def merge(channels: list) -> np.ndarray:
+def merge(channels: list, layout: int = cts.LAYOUT_INTERLEAVED, 
+          copy: bool = True) -> np.ndarray:
     """Merge list of channels into a single image
+    As with np.dstack, inputs that already have a channel axis (i.e. an 
+    RGB image and an alpha plane) are concatenated along it. The lowest 
+    dimensional inputs are treated as single channels, so channels of a 
+    batch (N x H x W) give N x H x W x C
+    The result is a new array. With copy=False, channels that are, in 
+    order, the channels of one array with that layout (i.e. they came 
+    from split) give back a view of that array instead, which writes 
+    through to it
+
+    Args:
+        channels (list): List of chanels (planes and/or multichannel arrays)
+        layout (int, optional): Channel layout (LAYOUT_ prefix). Defaults to LAYOUT_INTERLEAVED.
+        copy (bool, optional): Always return a new array. Defaults to True.
+
+    Returns:
+        np.ndarray: Composed image (... x H x W x C, or ... x C x H x W if planar)
+    """
+    axis = _channel_axis(layout)
+    if not copy:
+        view = _channels_view(channels, axis)
+        if view is not None:
+            return view
+    return _concatenate_channels(channels, axis)
+
+def _concatenate_channels(channels: list, axis: int) -> np.ndarray:
+    """Concatenates channels along the channel axis, adding that axis to 
+    the lowest dimensional inputs (1-D inputs are merged as np.dstack does)
+    """
+    channels = [np.asarray(channel) for channel in channels]
+    planes = min(len(channel.shape) for channel in channels)
+    if axis == -1 and planes < 2:
+        return np.dstack(channels)
+    return np.concatenate([np.expand_dims(channel, axis) if len(channel.shape) == planes 
+                           else channel for channel in channels], axis=axis)
+
+def _channels_view(channels: list, axis: int) -> np.ndarray:
+    """Array whose channels are exactly the given arrays, if they are evenly
+    spaced views of the same buffer, else None
+    """
+    first = channels[0]
+    if not all(isinstance(channel, np.ndarray) for channel in channels):
+        return None
+    position = len(first.shape) + 1 + axis
+    if first.base is None or position < 0:
+        return None
+    addresses = [channel.__array_interface__["data"][0] for channel in channels]
+    step = addresses[1] - addresses[0] if len(channels) > 1 else first.itemsize
+    for i, (channel, address) in enumerate(zip(channels, addresses)):
+        if (channel.base is not first.base or channel.shape != first.shape or 
+            channel.strides != first.strides or channel.dtype != first.dtype or
+            address != addresses[0] + i * step):
+            return None
+    
+    shape = first.shape[:position] + (len(channels),) + first.shape[position:]
+    strides = first.strides[:position] + (step,) + first.strides[position:]
+    # reject views where two elements would share memory (i.e. repeated channels)
+    span = first.itemsize
+    for stride, size in sorted((abs(st), n) for st, n in zip(strides, shape) if n > 1):
+        if stride < span:
+            return None
+        span += stride * (size - 1)
+    return np.lib.stride_tricks.as_strided(first, shape, strides, writeable=first.flags.writeable)
+
+def to_planar(image: np.ndarray) -> np.ndarray:
+    """Converts an interleaved image (... x H x W x C) to planar (... x C x H x W)
+
+    Args:
+        image (np.ndarray): Input image
+
+    Returns:
+        np.ndarray: Contiguous planar image
+    """
+    return np.ascontiguousarray(np.moveaxis(image, -1, -3))
+
+def to_interleaved(image: np.ndarray) -> np.ndarray:
+    """Converts a planar image (... x C x H x W) to interleaved (... x H x W x C)
+
+    Args:
+        image (np.ndarray): Input image
+
+    Returns:
+        np.ndarray: Contiguous interleaved image
+    """
+    return np.ascontiguousarray(np.moveaxis(image, -3, -1))
+
+def process_tiled(image: np.ndarray, func, tile_shape: tuple, halo: int = 0, 
+                  out: np.ndarray = None) -> np.ndarray:
+    """Applies func tile by tile, so temporaries are bounded by the tile size
+    Tiles cover the leading len(tile_shape) axes, i.e. (rows,) walks the 
+    image in strips and (rows, cols) in blocks. Each tile is extended by 
+    halo pixels on every side (clamped at the borders) before calling func 
+    and the extension is cropped from its result. The output is allocated 
+    on the first tile unless out is given (which may be a np.memmap)
 
     Args:
-        channels (list): List of chanels
+        image (np.ndarray): Input image (may be a np.memmap)
+        func (callable): Function of a tile, keeping the tiled axes' sizes
+        tile_shape (tuple): Tile size along the leading axes
+        halo (int, optional): Overlap added around each tile. Defaults to 0.
+        out (np.ndarray, optional): Output buffer. Defaults to None.
+
+    Raises:
+        ValueError: If halo > 0 and out overlaps image
 
     Returns:
-        np.ndarray: Composed image
+        np.ndarray: Output image
+    """
+    tile_shape = tuple(tile_shape)
+    axes = len(tile_shape)
+    assert 0 < axes <= len(image.shape), "Tile shape doesn't match the image."
+    if halo > 0 and out is not None and np.shares_memory(image, out):
+        raise ValueError("Tiles with a halo can't be written on top of the input.")
+    
+    size = image.shape[:axes]
+    starts = [range(0, n, t) for n, t in zip(size, tile_shape)]
+    for corner in itertools.product(*starts):
+        core = tuple(slice(c, min(c + t, n)) for c, t, n in zip(corner, tile_shape, size))
+        padded = tuple(slice(max(s.start - halo, 0), min(s.stop + halo, n)) 
+                       for s, n in zip(core, size))
+        crop = tuple(slice(s.start - p.start, s.stop - p.start) for s, p in zip(core, padded))
+        
+        result = func(image[padded])[crop]
+        if out is None:
+            out = np.empty(size + result.shape[axes:], dtype=result.dtype)
+        out[core] = result
+    return out
+
+def set_num_threads(threads: int) -> None:
+    """Sets how many threads convert_color, normalize, map_to_range and 
+    clip_to_range use by default (1, the default, runs serially)
+
+    Args:
+        threads (int): Number of threads
+    """
+    global _num_threads
+    _num_threads = max(int(threads), 1)
+
+def get_num_threads() -> int:
+    """Returns the default number of threads (see set_num_threads)
+
+    Returns:
+        int: Number of threads
+    """
+    return _num_threads
+
+def _get_executor(threads: int) -> ThreadPoolExecutor:
+    """Shared thread pool with at least the given number of workers
+    A smaller pool is replaced but not shut down: other callers may still be
+    submitting bands to it, and its idle threads exit once it's released
+    """
+    global _executor, _executor_threads
+    with _executor_lock:
+        if _executor_threads < threads:
+            _executor = ThreadPoolExecutor(max_workers=threads)
+            _executor_threads = threads
+        return _executor
+
+def process_parallel(image: np.ndarray, func, threads: int = None, 
+                     out: np.ndarray = None) -> np.ndarray:
+    """Applies func to row bands of the image on a thread pool
+    The leading axis is split into one band per thread. NumPy releases the
+    GIL inside its kernels, so bands run concurrently; since every band goes
+    through the same operations the result is identical to func(image). 
+    Small images (under PARALLEL_MIN_SIZE elements) run serially
+
+    Args:
+        image (np.ndarray): Input image
+        func (callable): func(band, out=None) of a band, keeping its number
+            of rows. With out, it writes the result to that band of the buffer
+        threads (int, optional): Number of threads, the default if None. Defaults to None.
+        out (np.ndarray, optional): Output buffer (may be image). Defaults to None.
+
+    Returns:
+        np.ndarray: Output image
+    """
+    bands = _row_bands(image.shape, threads, image.size)
+    if bands is None:
+        return func(image) if out is None else func(image, out=out)
+    
+    executor = _get_executor(len(bands))
+    if out is not None:
+        futures = [executor.submit(func, image[band], out=out[band]) for band in bands]
+        for future in futures:
+            future.result()
+        return out
+    futures = [executor.submit(func, image[band]) for band in bands]
+    for band, future in zip(bands, futures):
+        result = future.result()
+        if out is None:
+            out = np.empty(image.shape[:1] + result.shape[1:], dtype=result.dtype)
+        out[band] = result
+    return out
+
+def _row_bands(shape: tuple, threads: int, size: int) -> list:
+    """Slices splitting the leading axis into one band per thread, or None
+    if the work should run serially
+    """
+    threads = _num_threads if threads is None else threads
+    threads = min(threads, shape[0]) if len(shape) > 0 else 1
+    if threads <= 1 or size < PARALLEL_MIN_SIZE:
+        return None
+    bounds = np.linspace(0, shape[0], threads + 1).astype(int)
+    return [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+def _run_regions(shape: tuple, func, tile_shape: tuple = None, threads: int = None, 
+                 size: int = 0) -> None:
+    """Calls func(index) over regions covering an array of the given shape, 
+    where index is a tuple of slices of the leading axes: tiles (serially)
+    if tile_shape is given, else row bands on the thread pool
     """
-    return np.dstack(channels)
+    if tile_shape is not None:
+        starts = [range(0, n, t) for n, t in zip(shape, tile_shape)]
+        for corner in itertools.product(*starts):
+            func(tuple(slice(c, c + t) for c, t in zip(corner, tile_shape)))
+        return
+    bands = _row_bands(shape, threads, size)
+    if bands is None:
+        func((slice(None),))
+        return
+    executor = _get_executor(len(bands))
+    for future in [executor.submit(func, (band,)) for band in bands]:
+        future.result()
         
 __all__ = [
     "show",
+    "set_precision",
+    "get_precision",
+    "convert_dtype",
+    "minmax",
     "normalize",
     "map_to_range",
     "clip_to_range",
     "split",
-    "merge"
+    "merge",
+    "to_planar",
+    "to_interleaved",
+    "process_tiled",
+    "process_parallel",
+    "set_num_threads",
+    "get_num_threads"
 ]
\ No newline at end of file
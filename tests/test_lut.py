@@ -0,0 +1,23 @@
+# site-packages
+import numpy as np
+
+# local
+import image_processing as ip
+import image_processing.lut as lut
+
+# native
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_concurrent_first_use_builds_once(monkeypatch):
+    builds = []
+    build_lut = lut.build_lut
+    monkeypatch.setattr(lut, "build_lut", lambda *args: builds.append(1) or build_lut(*args))
+    ip.clear_lut_cache()
+    image = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype="uint8")
+
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        results = list(callers.map(
+            lambda _: ip.convert_color(image, ip.COLOR_RGB2XYZ, use_lut=True, lut_step=5), range(4)))
+    assert len(builds) == 1
+    assert all(np.array_equal(result, results[0]) for result in results)
@@ -0,0 +1,20 @@
+# site-packages
+import numpy as np
+
+# local
+import image_processing as ip
+
+# native
+from concurrent.futures import ThreadPoolExecutor
+
+
+def test_parallel_calls_with_mixed_thread_counts():
+    image = np.random.default_rng(0).random((256, 1024, 3), dtype="float32")
+    expected = ip.normalize(image, threads=1)
+
+    def run(i):
+        threads = 2 + i % 7
+        return np.array_equal(ip.normalize(image, threads=threads), expected)
+
+    with ThreadPoolExecutor(max_workers=8) as callers:
+        assert all(callers.map(run, range(200)))